@@ -9,8 +9,12 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+
+from todoapp.handlers import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todoapp.settings')
 
-application = get_asgi_application()
+# As get_asgi_application(), with the handler streaming the export.
+django.setup(set_prefix=False)
+application = ASGIHandler()
@@ -0,0 +1,27 @@
+class HealthCheckMixin:
+    """
+    Check a persistent connection before its first use in each request.
+
+    Backport of the CONN_HEALTH_CHECKS database setting: a connection kept
+    open by CONN_MAX_AGE may have been dropped by the server or a pooler
+    in between requests, and is then replaced instead of failing the
+    request.
+    """
+    health_check_done = False
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if self.connection is not None and \
+                self.settings_dict.get('CONN_HEALTH_CHECKS') and \
+                not self.health_check_done and not self.in_atomic_block:
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
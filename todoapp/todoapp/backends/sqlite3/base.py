@@ -0,0 +1,24 @@
+from django.db.backends.sqlite3 import base
+
+from todoapp.backends.base import HealthCheckMixin
+
+
+class DatabaseWrapper(HealthCheckMixin, base.DatabaseWrapper):
+    """
+    SQLite tuned for concurrent requests on a single node.
+
+    The PRAGMAS database setting is applied to every new connection, and
+    TRANSACTION_MODE (e.g. IMMEDIATE) is used to begin transactions, so a
+    writer waits on busy_timeout for the lock up front instead of failing
+    with "database is locked" when a read transaction is upgraded.
+    """
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for pragma, value in self.settings_dict.get('PRAGMAS', {}).items():
+            conn.execute('PRAGMA %s = %s' % (pragma, value))
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(
+            'BEGIN %s' % self.settings_dict.get('TRANSACTION_MODE', ''))
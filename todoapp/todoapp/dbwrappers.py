@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+_wrappers = ContextVar('execute_wrappers', default=())
+
+
+def _execute(execute, sql, params, many, context):
+    for wrapper in reversed(_wrappers.get()):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def install(connection):
+    # First in the list, as connection.execute_wrapper() removes its
+    # wrapper by popping the last one.
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _execute)
+
+
+def _install_on_connect(sender, connection, **kwargs):
+    install(connection)
+
+
+connection_created.connect(_install_on_connect)
+
+
+@contextmanager
+def execute_wrapper(wrapper):
+    """
+    Like `connection.execute_wrapper()`, for the queries on all
+    connections run in the current context rather than the current
+    thread: the queries of an async view run in the threads of
+    `sync_to_async()`, which copy the context but have their own
+    connections.
+    """
+    for connection in connections.all():
+        install(connection)
+    token = _wrappers.set(_wrappers.get() + (wrapper,))
+    try:
+        yield
+    finally:
+        _wrappers.reset(token)
@@ -0,0 +1,62 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler as BaseASGIHandler
+
+
+_END = object()
+
+
+async def iterate_streaming_content(response):
+    """
+    Iterate the content of a streaming response from async code.
+
+    Every part is produced in the thread-sensitive executor, where the
+    views run: streaming content like the export reads the database while
+    it is iterated, which is not allowed on the event loop.
+    """
+    iterator = iter(response)
+    while True:
+        part = await sync_to_async(next, thread_sensitive=True)(
+            iterator, _END)
+        if part is _END:
+            return
+        yield part
+
+
+class ASGIHandler(BaseASGIHandler):
+    """
+    The ASGI handler of Django, except that streaming responses are
+    iterated with `iterate_streaming_content()` instead of on the event
+    loop.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': self.get_response_headers(response),
+        })
+        async for part in iterate_streaming_content(response):
+            for chunk, _ in self.chunk_bytes(part):
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+    def get_response_headers(self, response):
+        headers = [
+            (header.encode('ascii') if isinstance(header, str) else header,
+             value.encode('latin1') if isinstance(value, str) else value)
+            for header, value in response.items()
+        ]
+        headers += [
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values()
+        ]
+        return headers
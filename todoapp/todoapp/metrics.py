@@ -0,0 +1,140 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from rest_framework import serializers
+
+
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (
+    100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class Histogram:
+    """A Prometheus histogram, one series per view."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, view, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(view)
+            if series is None:
+                series = self._series[view] = \
+                    [[0] * (len(self.buckets) + 1), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        with self._lock:
+            series = {
+                view: (list(counts), total)
+                for view, (counts, total) in self._series.items()
+            }
+
+        yield '# HELP %s %s' % (self.name, self.documentation)
+        yield '# TYPE %s histogram' % self.name
+        for view, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield '%s_bucket{view="%s",le="%s"} %d' % (
+                    self.name, view, bound, cumulative)
+            yield '%s_sum{view="%s"} %s' % (self.name, view, repr(total))
+            yield '%s_count{view="%s"} %d' % (self.name, view, cumulative)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+request_duration = Histogram(
+    'todoapp_request_duration_seconds',
+    'Wall time of requests.', DURATION_BUCKETS)
+response_size = Histogram(
+    'todoapp_response_size_bytes',
+    'Body size of non-streaming responses.', SIZE_BUCKETS)
+db_queries = Histogram(
+    'todoapp_db_queries',
+    'Database queries per request, of sampled requests.', QUERY_BUCKETS)
+db_duration = Histogram(
+    'todoapp_db_duration_seconds',
+    'Database time per request, of sampled requests.', DURATION_BUCKETS)
+serialize_duration = Histogram(
+    'todoapp_serialize_duration_seconds',
+    'Serializer time per request, of sampled requests.', DURATION_BUCKETS)
+render_duration = Histogram(
+    'todoapp_render_duration_seconds',
+    'JSON render time per request, of sampled requests.', DURATION_BUCKETS)
+
+HISTOGRAMS = (
+    request_duration, response_size, db_queries, db_duration,
+    serialize_duration, render_duration,
+)
+
+
+class RequestTimings:
+    """The timings of a sampled request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.durations = {'db': 0.0, 'serialize': 0.0, 'render': 0.0}
+        self._depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with todoapp.dbwrappers.execute_wrapper().
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.durations['db'] += time.perf_counter() - started
+
+    @contextmanager
+    def timed(self, name):
+        # Only the outermost of nested timings counts, so a serializer
+        # calling another is not counted twice.
+        self._depth += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if not self._depth:
+                self.durations[name] += time.perf_counter() - started
+
+
+request_timings = ContextVar('request_timings', default=None)
+
+
+@contextmanager
+def timed(name):
+    """Add the time of the block to the current sampled request, if any."""
+    timings = request_timings.get()
+    if timings is None:
+        yield
+    else:
+        with timings.timed(name):
+            yield
+
+
+class TimedSerializerMixin:
+    """Count the time spent building `data` as serializer time."""
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
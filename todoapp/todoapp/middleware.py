@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from todoapp.dbwrappers import execute_wrapper
+from todoapp.metrics import RequestTimings, db_duration, db_queries, \
+    render_duration, request_duration, request_timings, response_size, \
+    serialize_duration
+from todoapp.querybudget import QueryBudget
+from todoapp.routers import replica_reads
+
+
+logger = logging.getLogger('todoapp.querybudget')
+
+
+class AsyncCapableMiddleware:
+    """
+    Middleware running in the mode of the handler: `call()` for WSGI and
+    the coroutine `acall()` under ASGI, where a sync-only middleware would
+    be wrapped in the thread-sensitive adapter and serialize the async
+    views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the instance as a coroutine function for the handler.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.acall(request)
+        return self.call(request)
+
+
+class InstrumentationMiddleware(AsyncCapableMiddleware):
+    """
+    Record the wall time and response size of every request per view.
+
+    A METRICS_SAMPLE_RATE share of the requests also records the database
+    queries and time, through an execute wrapper of the request's context,
+    and the serializer and render time; these come back in a Server-Timing
+    header. Streaming responses are only timed until they start.
+    """
+
+    def call(self, request):
+        started = time.perf_counter()
+        timings = self.get_timings()
+        if timings is None:
+            response = self.get_response(request)
+        else:
+            with self.sampled(timings):
+                response = self.get_response(request)
+        return self.process_response(request, response, timings, started)
+
+    async def acall(self, request):
+        started = time.perf_counter()
+        timings = self.get_timings()
+        if timings is None:
+            response = await self.get_response(request)
+        else:
+            with self.sampled(timings):
+                response = await self.get_response(request)
+        return self.process_response(request, response, timings, started)
+
+    def get_timings(self):
+        if random.random() < settings.METRICS_SAMPLE_RATE:
+            return RequestTimings()
+        return None
+
+    @contextmanager
+    def sampled(self, timings):
+        token = request_timings.set(timings)
+        try:
+            with execute_wrapper(timings):
+                yield
+        finally:
+            request_timings.reset(token)
+
+    def process_response(self, request, response, timings, started):
+        elapsed = time.perf_counter() - started
+        view = self.get_view_name(request)
+        request_duration.observe(view, elapsed)
+        if not response.streaming:
+            response_size.observe(view, len(response.content))
+        if timings is not None:
+            db_queries.observe(view, timings.queries)
+            db_duration.observe(view, timings.durations['db'])
+            serialize_duration.observe(view, timings.durations['serialize'])
+            render_duration.observe(view, timings.durations['render'])
+            response['Server-Timing'] = self.get_server_timing(
+                timings, elapsed)
+        return response
+
+    def get_view_name(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None or not match.url_name:
+            return 'unmatched'
+        return match.url_name
+
+    def get_server_timing(self, timings, elapsed):
+        return ', '.join(
+            ['db;dur=%.2f;desc="%d queries"' % (
+                1000 * timings.durations['db'], timings.queries)] +
+            ['%s;dur=%.2f' % (name, 1000 * timings.durations[name])
+             for name in ('serialize', 'render')] +
+            ['total;dur=%.2f' % (1000 * elapsed)]
+        )
+
+
+class QueryBudgetMiddleware(AsyncCapableMiddleware):
+    """
+    Log the requests whose queries exceed the QUERY_BUDGET, or the
+    `query_budget` of their view, or that repeat a SELECT like an N+1
+    pattern. Only used with DEBUG on.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def call(self, request):
+        with self.get_query_budget() as budget:
+            response = self.get_response(request)
+        return self.process_response(request, response, budget)
+
+    async def acall(self, request):
+        with self.get_query_budget() as budget:
+            response = await self.get_response(request)
+        return self.process_response(request, response, budget)
+
+    def get_query_budget(self):
+        return QueryBudget(max_repeats=settings.QUERY_BUDGET_MAX_REPEATS)
+
+    def process_response(self, request, response, budget):
+        budget.max_queries = self.get_budget(request)
+        if budget.get_problems():
+            logger.warning(
+                'Query budget exceeded by %s %s\n%s',
+                request.method, request.path, budget.report())
+        return response
+
+    def get_budget(self, request):
+        match = getattr(request, 'resolver_match', None)
+        view = getattr(match and match.func, 'cls', None)
+        return getattr(view, 'query_budget', settings.QUERY_BUDGET)
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """
+    Serve safe requests from the read replicas, except for clients that
+    wrote within the last DATABASE_STICKY_WINDOW seconds: those are kept
+    on the primary by a cookie so they read their own writes.
+    """
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def call(self, request):
+        if request.method not in self.safe_methods:
+            return self.process_write(self.get_response(request))
+        if self.is_sticky(request):
+            return self.get_response(request)
+        with replica_reads():
+            return self.get_response(request)
+
+    async def acall(self, request):
+        if request.method not in self.safe_methods:
+            return self.process_write(await self.get_response(request))
+        if self.is_sticky(request):
+            return await self.get_response(request)
+        with replica_reads():
+            return await self.get_response(request)
+
+    def process_write(self, response):
+        if response.status_code < 400:
+            self.set_sticky(response)
+        return response
+
+    def is_sticky(self, request):
+        try:
+            return time.time() < float(
+                request.COOKIES[settings.DATABASE_STICKY_COOKIE])
+        except (KeyError, ValueError):
+            return False
+
+    def set_sticky(self, response):
+        window = settings.DATABASE_STICKY_WINDOW
+        response.set_cookie(
+            settings.DATABASE_STICKY_COOKIE, '%.3f' % (time.time() + window),
+            max_age=window, httponly=True, samesite='Lax')
@@ -0,0 +1,101 @@
+import re
+import traceback
+from collections import Counter
+from contextlib import ContextDecorator
+
+from django.conf import settings
+
+from todoapp.dbwrappers import execute_wrapper
+
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_SAVEPOINT = re.compile(r'^(RELEASE |ROLLBACK TO )?SAVEPOINT ')
+
+
+def get_sql_shape(sql):
+    """The SQL of a query with its IN lists collapsed."""
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+def get_project_stack():
+    """The frames of the current stack in the project's own code."""
+    base_dir = str(settings.BASE_DIR)
+    return [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base_dir) and
+        frame.filename != __file__
+    ]
+
+
+class QueryBudget:
+    """
+    Record the queries run within a block, also from the threads of its
+    `sync_to_async()` calls, on the `using` connection or else on all of
+    them, and check them against a budget: at most `max_queries` queries,
+    and no SELECT of the same shape run more than `max_repeats` times, the
+    mark of an N+1 pattern. The stack of the first repeat of a shape is
+    kept.
+
+    Savepoint statements are not counted, they only come from the
+    transactions of tests around the outermost atomic blocks.
+    """
+
+    def __init__(self, max_queries=None, max_repeats=2, using=None):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.using = using
+
+    def __enter__(self):
+        self.queries = []
+        self.shapes = Counter()
+        self.stacks = {}
+        self._wrapper = execute_wrapper(self.record)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._wrapper.__exit__(exc_type, exc_value, tb)
+
+    def record(self, execute, sql, params, many, context):
+        alias = context['connection'].alias
+        if self.using in (None, alias) and not _SAVEPOINT.match(sql):
+            self.queries.append(sql)
+            if sql.startswith('SELECT'):
+                shape = get_sql_shape(sql)
+                self.shapes[shape] += 1
+                if self.shapes[shape] == 2:
+                    self.stacks[shape] = get_project_stack()
+        return execute(sql, params, many, context)
+
+    def get_problems(self):
+        problems = []
+        if self.max_queries is not None and \
+                len(self.queries) > self.max_queries:
+            problems.append('%d queries, over the budget of %d' % (
+                len(self.queries), self.max_queries))
+        for shape, count in self.shapes.items():
+            if count > self.max_repeats:
+                problems.append(
+                    'Same SELECT run %d times, likely N+1:\n    %s\n'
+                    'First repeated at:\n%s' % (
+                        count, shape, ''.join(
+                            traceback.format_list(self.stacks[shape]))))
+        return problems
+
+    def report(self):
+        return '\n'.join(self.get_problems() + ['Queries:'] + [
+            '%d. %s' % (number, sql)
+            for number, sql in enumerate(self.queries, 1)
+        ])
+
+
+class query_budget(QueryBudget, ContextDecorator):
+    """
+    Fail a block or a test with an AssertionError when its queries exceed
+    the budget, see `QueryBudget`.
+    """
+
+    def __exit__(self, exc_type, exc_value, tb):
+        super().__exit__(exc_type, exc_value, tb)
+        if exc_type is None and self.get_problems():
+            raise AssertionError('Query budget exceeded: ' + self.report())
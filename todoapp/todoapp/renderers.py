@@ -0,0 +1,75 @@
+import json
+
+from django.conf import settings
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils.encoders import JSONEncoder
+
+from todoapp.metrics import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# orjson encodes datetimes itself, with the 'Z' suffix for UTC as DRF's
+# encoder does; anything else goes through the DRF encoder.
+_ORJSON_OPTIONS = 0 if orjson is None else \
+    orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+_encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps(data):
+    """Encode data to compact UTF-8 JSON bytes."""
+    if orjson is None:
+        return _encoder.encode(data).encode()
+    return orjson.dumps(
+        data, default=_encoder.default, option=_ORJSON_OPTIONS)
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    JSON renderer on orjson when it is installed.
+
+    Falls back to the stdlib encoder of DRF's renderer without orjson, for
+    indented output and when UNICODE_JSON or COMPACT_JSON are turned off.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if orjson is None or self.ensure_ascii or not self.compact or \
+                self.get_indent(accepted_media_type,
+                                renderer_context or {}) is not None:
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        ret = dumps(data)
+        # Escaped like DRF does, to stay a strict javascript subset.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028')\
+                .replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class JSONParser(parsers.JSONParser):
+    """JSON parser on orjson when it is installed."""
+    renderer_class = JSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or \
+                encoding.lower() not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        # Like the strict stdlib parser, orjson rejects NaN and Infinity.
+        try:
+            return orjson.loads(stream.read())
+        except json.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,51 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+_replica = ContextVar('replica', default=None)
+
+
+@contextmanager
+def replica_reads():
+    """
+    Let reads of routed models in this context go to a replica, the same
+    one for the whole context: replicas lag by different amounts, so the
+    reads of a request, like a list and its ETag, must not mix them.
+    """
+    replicas = settings.DATABASE_REPLICAS
+    token = _replica.set(random.choice(replicas) if replicas else None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send todo reads to the replica picked by `replica_reads` and
+    everything else, writes included, to the primary database.
+    """
+    route_app_labels = {'todos'}
+
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if model._meta.app_label not in self.route_app_labels or \
+                replica is None:
+            return None
+        # Reads inside a transaction must see its own writes.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
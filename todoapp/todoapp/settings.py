@@ -10,9 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -24,9 +27,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = '0#jdc-8tz@cawm=dy-4($m8iq(r^(6(jvf3$j7sgrw)bf42z1!'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', 'true').lower() != 'false'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = list(filter(
+    None, os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')))
 
 
 # Application definition
@@ -46,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'todoapp.middleware.InstrumentationMiddleware',
+    'todoapp.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,10 +59,24 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'todoapp.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'todoapp.urls'
 
+# Share of requests whose database, serializer and render time is recorded
+# and sent in a Server-Timing header, and the addresses that may read
+# /metrics.
+METRICS_SAMPLE_RATE = float(os.environ.get('DJANGO_METRICS_SAMPLE_RATE', 0.1))
+METRICS_ALLOWED_IPS = os.environ.get(
+    'DJANGO_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+# With DEBUG on, requests running more queries than this, unless their view
+# sets a query_budget, or the same SELECT more than this many times are
+# logged.
+QUERY_BUDGET = 20
+QUERY_BUDGET_MAX_REPEATS = 2
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -79,12 +99,134 @@ WSGI_APPLICATION = 'todoapp.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DJANGO_DB picks the database mode:
+#   sqlite        development database file (default)
+#   sqlite-tuned  SQLite in WAL mode for single node deployments
+#   postgres      PostgreSQL with persistent, health checked connections
+#   pgbouncer     PostgreSQL behind PgBouncer in transaction pooling mode
+# Connections are kept open for DJANGO_DB_CONN_MAX_AGE seconds.
+
+_DB = os.environ.get('DJANGO_DB', 'sqlite')
+_DB_CONN_MAX_AGE = int(os.environ.get(
+    'DJANGO_DB_CONN_MAX_AGE', 0 if _DB == 'sqlite' else 60))
+
+if _DB == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': _DB_CONN_MAX_AGE,
+        }
     }
-}
+elif _DB == 'sqlite-tuned':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'todoapp.backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': _DB_CONN_MAX_AGE,
+            'PRAGMAS': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': int(
+                    os.environ.get('DJANGO_DB_BUSY_TIMEOUT', 5000)),
+                'mmap_size': 256 * 1024 * 1024,
+            },
+            'TRANSACTION_MODE': 'IMMEDIATE',
+        }
+    }
+elif _DB in ('postgres', 'pgbouncer'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'todoapp.backends.postgresql',
+            'NAME': os.environ.get('DJANGO_DB_NAME', 'todoapp'),
+            'USER': os.environ.get('DJANGO_DB_USER', ''),
+            'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('DJANGO_DB_HOST', ''),
+            'PORT': os.environ.get('DJANGO_DB_PORT', ''),
+            'CONN_MAX_AGE': _DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # Server-side cursors do not survive transaction pooling.
+            'DISABLE_SERVER_SIDE_CURSORS': _DB == 'pgbouncer',
+        }
+    }
+else:
+    raise ImproperlyConfigured('Unknown DJANGO_DB %r' % _DB)
+
+# Tests of SQLite run in memory, where concurrent connections fail on
+# locked tables instead of waiting; the concurrency tests are skipped
+# unless DJANGO_TEST_DB_NAME names a test database file.
+if os.environ.get('DJANGO_TEST_DB_NAME'):
+    DATABASES['default']['TEST'] = {
+        'NAME': os.environ['DJANGO_TEST_DB_NAME']}
+
+# Read replicas, as a comma separated list of database files (SQLite) or
+# hosts (PostgreSQL) in DJANGO_DB_REPLICAS. Safe requests read todos from
+# a replica, unless the client wrote within the last
+# DATABASE_STICKY_WINDOW seconds.
+
+DATABASE_REPLICAS = []
+for _n, _replica in enumerate(filter(
+        None, os.environ.get('DJANGO_DB_REPLICAS', '').split(',')), 1):
+    DATABASES['replica%d' % _n] = {
+        **DATABASES['default'],
+        'NAME' if _DB.startswith('sqlite') else 'HOST': _replica.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append('replica%d' % _n)
+
+DATABASE_ROUTERS = ['todoapp.routers.ReplicaRouter']
+DATABASE_STICKY_WINDOW = int(os.environ.get('DJANGO_DB_STICKY_WINDOW', 10))
+DATABASE_STICKY_COOKIE = 'db_sticky'
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+# DJANGO_CACHE picks the cache of the category lists, the JWT revocation
+# checks and the shared throttle buckets:
+#   locmem     process memory (default): every worker process keeps its own
+#              and misses the invalidations of the others, so only for
+#              single process servers
+#   memcached  Memcached servers listed in DJANGO_CACHE_LOCATION (comma
+#              separated), needs pylibmc
+#   redis      Redis URL in DJANGO_CACHE_LOCATION, needs django-redis
+#   none       no caching, for multi-process servers without a shared cache
+
+_CACHE = os.environ.get('DJANGO_CACHE', 'locmem')
+_CACHE_LOCATION = os.environ.get('DJANGO_CACHE_LOCATION', '')
+
+if _CACHE == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+elif _CACHE == 'memcached':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyLibMCCache',
+            'LOCATION': _CACHE_LOCATION.split(','),
+        }
+    }
+elif _CACHE == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': _CACHE_LOCATION,
+        }
+    }
+elif _CACHE == 'none':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }
+    }
+else:
+    raise ImproperlyConfigured('Unknown DJANGO_CACHE %r' % _CACHE)
+
+# Cache alias and timeout (seconds) of the per-user category list cache
+TODOS_CATEGORY_CACHE = 'default'
+TODOS_CATEGORY_CACHE_TIMEOUT = 300
 
 
 # Password validation
@@ -105,6 +247,35 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Preferred password hasher, picked by DJANGO_PASSWORD_HASHER. The others
+# stay installed so existing hashes verify and are upgraded on login.
+# 'argon2' needs argon2-cffi and 'bcrypt' needs bcrypt.
+
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+}
+_PASSWORD_HASHER = os.environ.get('DJANGO_PASSWORD_HASHER', 'pbkdf2')
+
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[_PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items()
+    if name != _PASSWORD_HASHER
+]
+
+AUTHENTICATION_BACKENDS = [
+    'user.backends.PooledModelBackend',
+]
+
+# Password hashing runs on a bounded thread pool; requests beyond the
+# workers plus queue depth get a 429 with Retry-After (seconds).
+PASSWORD_HASHING_WORKERS = int(
+    os.environ.get('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1))
+PASSWORD_HASHING_QUEUE_DEPTH = int(
+    os.environ.get('PASSWORD_HASHING_QUEUE_DEPTH',
+                   2 * PASSWORD_HASHING_WORKERS))
+PASSWORD_HASHING_RETRY = 1
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
@@ -127,10 +298,42 @@ STATIC_URL = '/static/'
 
 SECRET_KEY = 'SECRET_KEY'
 
+# Token bucket rates per throttle scope, as '<requests>/<s|m|h|d>'; a
+# client may burst a whole period's requests. DJANGO_THROTTLE_RATES
+# overrides them, e.g. 'items=6000/min,auth=10/min'.
+_THROTTLE_RATES = {
+    'items': '1200/min',
+    'categories': '600/min',
+    'auth': '30/min',
+}
+for _rate in filter(None, os.environ.get('DJANGO_THROTTLE_RATES', '')
+                    .split(',')):
+    _scope, _, _rate = _rate.partition('=')
+    _THROTTLE_RATES[_scope.strip()] = _rate.strip() or None
+
+# The buckets live in process memory ('local') or in the THROTTLE_CACHE
+# shared by all processes ('cache').
+THROTTLE_STORE = os.environ.get('DJANGO_THROTTLE_STORE', 'local')
+THROTTLE_CACHE = 'default'
+
+# JSON is rendered and parsed with orjson when it is installed. The
+# browsable API is only offered with DEBUG, it is costly to render.
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user.authentication.StatelessJWTAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'todoapp.renderers.JSONRenderer',
+    ] + (['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'todoapp.renderers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'todoapp.throttling.UserTokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': _THROTTLE_RATES,
 }
 
 SIMPLE_JWT = {
@@ -153,6 +356,7 @@ SIMPLE_JWT = {
 
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    'TOKEN_USER_CLASS': 'user.authentication.StatelessUser',
 
     'JTI_CLAIM': 'jti',
 
@@ -160,3 +364,8 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
+
+# Seconds a user's active flag is cached for revoking stateless JWT users
+# (deactivated or deleted); 0 trusts the token claims until they expire.
+JWT_REVOCATION_CHECK_TTL = 60
+JWT_REVOCATION_CACHE = 'default'
@@ -0,0 +1,696 @@
+import asyncio
+import datetime
+import decimal
+import io
+import os
+import tempfile
+import time
+import uuid
+from unittest import skip
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection, connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, \
+    TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.asyncio import async_unsafe
+from django.utils.translation import gettext_lazy
+from rest_framework import renderers, status
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APIClient
+
+from todoapp.backends.sqlite3.base import DatabaseWrapper
+from todoapp.handlers import ASGIHandler
+from todoapp.metrics import HISTOGRAMS, request_duration, response_size
+from todoapp.middleware import QueryBudgetMiddleware, \
+    ReplicaRoutingMiddleware
+from todoapp.querybudget import QueryBudget, query_budget
+from todoapp.renderers import JSONParser, JSONRenderer
+from todoapp.routers import ReplicaRouter, replica_reads
+from todoapp.throttling import CacheBucketStore, LocalBucketStore, \
+    UserTokenBucketThrottle, get_bucket_store
+from todos.models import Category
+from todos.views import CategoryViewSet
+from user.serializers import LoginSerializer
+
+
+def sqlite_settings(name, **settings):
+    return {
+        'ENGINE': 'todoapp.backends.sqlite3',
+        'NAME': name,
+        'ATOMIC_REQUESTS': False,
+        'AUTOCOMMIT': True,
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {},
+        'TIME_ZONE': None,
+        **settings,
+    }
+
+
+class TunedSqliteBackendTests(SimpleTestCase):
+    """Test the tuned SQLite database backend"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.name = os.path.join(directory.name, 'db.sqlite3')
+
+    def get_connection(self, **settings):
+        connection = DatabaseWrapper(sqlite_settings(self.name, **settings))
+        self.addCleanup(connection.close)
+        return connection
+
+    def fetch(self, connection, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """Test the configured pragmas are set on new connections"""
+        connection = self.get_connection(PRAGMAS={
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 1234,
+        })
+
+        self.assertEqual(
+            self.fetch(connection, 'PRAGMA journal_mode'), 'wal')
+        self.assertEqual(self.fetch(connection, 'PRAGMA synchronous'), 1)
+        self.assertEqual(self.fetch(connection, 'PRAGMA busy_timeout'), 1234)
+
+    def test_transaction_mode(self):
+        """Test transactions begin with the configured mode"""
+        connection = self.get_connection(TRANSACTION_MODE='IMMEDIATE')
+        connection.ensure_connection()
+
+        with patch.object(connection, 'cursor') as cursor:
+            connection._start_transaction_under_autocommit()
+
+        cursor().execute.assert_called_once_with('BEGIN IMMEDIATE')
+
+    def test_health_check_replaces_unusable_connection(self):
+        """Test a dropped persistent connection is reopened on next use"""
+        connection = self.get_connection(CONN_HEALTH_CHECKS=True)
+        connection.ensure_connection()
+        dropped = connection.connection
+        connection.close_if_unusable_or_obsolete()
+
+        with patch.object(connection, 'is_usable', return_value=False):
+            self.assertEqual(self.fetch(connection, 'SELECT 1'), 1)
+        self.assertIsNot(connection.connection, dropped)
+
+    def test_health_check_once_per_request(self):
+        """Test the connection is only checked on its first use"""
+        connection = self.get_connection(CONN_HEALTH_CHECKS=True)
+        connection.ensure_connection()
+        connection.close_if_unusable_or_obsolete()
+
+        with patch.object(connection, 'is_usable',
+                          return_value=True) as is_usable:
+            self.fetch(connection, 'SELECT 1')
+            self.fetch(connection, 'SELECT 1')
+
+        is_usable.assert_called_once_with()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTests(SimpleTestCase):
+    """Test routing todo reads to the read replicas"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_use_primary_by_default(self):
+        """Test reads outside replica_reads() are not routed"""
+        self.assertIsNone(self.router.db_for_read(Category))
+
+    def test_reads_use_replica(self):
+        """Test todo reads inside replica_reads() go to a replica"""
+        with replica_reads():
+            self.assertIn(
+                self.router.db_for_read(Category), ['replica1', 'replica2'])
+
+    def test_reads_use_one_replica(self):
+        """Test the reads inside one replica_reads() use the same replica"""
+        with replica_reads():
+            replicas = {self.router.db_for_read(Category) for _ in range(20)}
+
+        self.assertEqual(len(replicas), 1)
+
+    def test_other_apps_not_routed(self):
+        """Test reads of models outside the todo app are not routed"""
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(get_user_model()))
+
+    def test_reads_in_transaction_use_primary(self):
+        """Test reads inside a transaction see its writes on the primary"""
+        with replica_reads(), patch.object(
+                connections['default'], 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Category), 'default')
+
+    def test_writes_use_primary(self):
+        """Test writes always go to the primary"""
+        with replica_reads():
+            self.assertEqual(self.router.db_for_write(Category), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test reads are not routed without configured replicas"""
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(Category))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'],
+                   DATABASE_STICKY_WINDOW=10)
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+    """Test the read-your-writes replica routing middleware"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def get_response(self, request):
+        response = HttpResponse(status=self.status)
+        response.read_db = self.router.db_for_read(Category)
+        return response
+
+    def call(self, request, status=200):
+        self.status = status
+        return ReplicaRoutingMiddleware(self.get_response)(request)
+
+    def test_safe_request_reads_replica(self):
+        """Test a GET without a recent write reads from a replica"""
+        response = self.call(self.factory.get('/'))
+
+        self.assertEqual(response.read_db, 'replica1')
+        self.assertNotIn('db_sticky', response.cookies)
+
+    def test_write_sets_sticky_cookie(self):
+        """Test a successful write keeps the client on the primary"""
+        response = self.call(self.factory.post('/'), status=201)
+
+        self.assertIsNone(response.read_db)
+        cookie = response.cookies['db_sticky']
+        self.assertEqual(cookie['max-age'], 10)
+        self.assertAlmostEqual(
+            float(cookie.value), time.time() + 10, delta=1)
+
+    def test_failed_write_not_sticky(self):
+        """Test a rejected write does not set the sticky cookie"""
+        response = self.call(self.factory.post('/'), status=400)
+
+        self.assertNotIn('db_sticky', response.cookies)
+
+    def test_sticky_request_reads_primary(self):
+        """Test a GET within the sticky window reads from the primary"""
+        request = self.factory.get('/')
+        request.COOKIES['db_sticky'] = str(time.time() + 5)
+
+        self.assertIsNone(self.call(request).read_db)
+
+    def test_expired_sticky_cookie_reads_replica(self):
+        """Test a GET after the sticky window reads from a replica"""
+        request = self.factory.get('/')
+        request.COOKIES['db_sticky'] = str(time.time() - 1)
+
+        self.assertEqual(self.call(request).read_db, 'replica1')
+
+    def test_invalid_sticky_cookie_reads_replica(self):
+        """Test a malformed sticky cookie is ignored"""
+        request = self.factory.get('/')
+        request.COOKIES['db_sticky'] = 'invalid'
+
+        self.assertEqual(self.call(request).read_db, 'replica1')
+
+
+@async_unsafe
+def read_part():
+    return b'part'
+
+
+class ASGIHandlerTests(SimpleTestCase):
+    """Test the ASGI handler streaming responses off the event loop"""
+
+    async def test_streaming_response(self):
+        """Test streaming content is produced where sync code may run"""
+        response = StreamingHttpResponse(read_part() for _ in range(2))
+        response['X-Test'] = 'value'
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await ASGIHandler().send_response(response, send)
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn((b'X-Test', b'value'), messages[0]['headers'])
+        self.assertEqual(
+            [message.get('body') for message in messages[1:]],
+            [b'part', b'part', None])
+
+
+class JSONRendererTests(SimpleTestCase):
+    """Test the orjson renderer and parser"""
+
+    data = {
+        'id': 1,
+        'name': 'ítem \u2028 "quoted"',
+        'done': False,
+        'date_created': datetime.datetime(
+            2021, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+        'naive': datetime.datetime(2021, 3, 1, 12, 30),
+        'date': datetime.date(2021, 3, 1),
+        'price': decimal.Decimal('1.5'),
+        'uuid': uuid.UUID(int=1),
+        'lazy': gettext_lazy('Invalid category'),
+        'ratio': 0.1,
+        'results': [None, {'nested': True}],
+    }
+
+    def test_same_output_as_drf(self):
+        """Test the output is byte for byte the one of DRF's renderer"""
+        self.assertEqual(JSONRenderer().render(self.data),
+                         renderers.JSONRenderer().render(self.data))
+
+    def test_same_output_without_orjson(self):
+        """Test the stdlib fallback gives the same output"""
+        with patch('todoapp.renderers.orjson', None):
+            self.assertEqual(JSONRenderer().render(self.data),
+                             renderers.JSONRenderer().render(self.data))
+
+    def test_indent(self):
+        """Test indented output is still supported"""
+        self.assertEqual(
+            JSONRenderer().render(
+                self.data, 'application/json; indent=4'),
+            renderers.JSONRenderer().render(
+                self.data, 'application/json; indent=4'))
+
+    def test_render_none(self):
+        """Test no data renders an empty body"""
+        self.assertEqual(JSONRenderer().render(None), b'')
+
+    def test_parse(self):
+        """Test parsing a JSON body"""
+        self.assertEqual(
+            JSONParser().parse(io.BytesIO('{"name": "ítem"}'.encode())),
+            {'name': 'ítem'})
+
+    def test_parse_invalid(self):
+        """Test invalid JSON and non-finite numbers are rejected"""
+        for body in (b'{"name": ', b'{"value": NaN}'):
+            with self.assertRaises(ParseError):
+                JSONParser().parse(io.BytesIO(body))
+
+
+class LocalBucketStoreTests(SimpleTestCase):
+    """Test the in-process token bucket store"""
+
+    def setUp(self):
+        self.store = LocalBucketStore()
+
+    def consume(self, now, key='key'):
+        return self.store.consume(key, 2, 60, now=now)
+
+    def test_burst_then_wait(self):
+        """Test a full bucket allows a burst and then reports the wait"""
+        self.assertIsNone(self.consume(100))
+        self.assertIsNone(self.consume(100))
+
+        self.assertAlmostEqual(self.consume(100), 30)
+        self.assertAlmostEqual(self.consume(110), 20)
+
+    def test_refill(self):
+        """Test tokens refill at the rate, up to the bucket size"""
+        self.consume(100)
+        self.consume(100)
+
+        self.assertIsNone(self.consume(130))
+        self.assertIsNotNone(self.consume(130))
+        self.assertIsNone(self.consume(1000))
+        self.assertIsNone(self.consume(1000))
+        self.assertIsNotNone(self.consume(1000))
+
+    def test_keys_independent(self):
+        """Test every key has its own bucket"""
+        self.consume(100)
+        self.consume(100)
+
+        self.assertIsNone(self.consume(100, key='other'))
+
+    def test_prune_full_buckets(self):
+        """Test full buckets are dropped beyond the key limit"""
+        self.store.max_keys = 2
+        self.consume(100, key='a')
+        self.consume(100, key='a')
+        self.consume(100, key='b')
+
+        self.consume(200, key='c')
+
+        self.assertEqual(list(self.store._buckets), ['c'])
+
+    def test_prune_keeps_partly_drained_buckets(self):
+        """Test buckets not full again by their own size are kept"""
+        self.store.max_keys = 2
+        self.store.consume('b', 10, 60, now=100)
+        for _ in range(5):
+            self.store.consume('a', 60, 3600, now=100)
+
+        # 'b' is full again; 'a' holds 55.1 of 60, which would be full by
+        # the size of 'c'.
+        self.store.consume('c', 10, 60, now=106)
+
+        for _ in range(55):
+            self.assertIsNone(self.store.consume('a', 60, 3600, now=106))
+        self.assertIsNotNone(self.store.consume('a', 60, 3600, now=106))
+
+    def test_prune_least_recently_used(self):
+        """Test the least recently used bucket goes beyond the key limit"""
+        self.store.max_keys = 2
+        self.consume(100, key='a')
+        self.consume(100, key='b')
+        self.consume(100, key='a')
+
+        self.consume(100, key='c')
+
+        self.assertEqual(list(self.store._buckets), ['a', 'c'])
+        self.assertIsNotNone(self.consume(100, key='a'))
+
+
+class CacheBucketStoreTests(LocalBucketStoreTests):
+    """Test the shared cache token bucket store"""
+
+    def setUp(self):
+        self.store = CacheBucketStore()
+        self.store.reset()
+        self.addCleanup(self.store.reset)
+
+    def test_prune_full_buckets(self):
+        """Test idle buckets expire once they are full again"""
+        with patch.object(self.store.cache, 'touch') as touch:
+            self.consume(100)
+            self.consume(110)
+
+        # Two tokens refill in 60 seconds, one is partly refilled.
+        self.assertEqual(touch.call_args[0][1], 50)
+
+    @skip('The cache evicts its own keys')
+    def test_prune_least_recently_used(self):
+        pass
+
+
+@override_settings(THROTTLE_STORE='local')
+class ThrottleApiTests(TestCase):
+    """Test throttling of the API endpoints"""
+
+    def setUp(self):
+        get_bucket_store().reset()
+        self.addCleanup(get_bucket_store().reset)
+        rates = patch.dict(UserTokenBucketThrottle.THROTTLE_RATES, {
+            'items': '2/min', 'categories': '2/min', 'auth': '2/min'})
+        rates.start()
+        self.addCleanup(rates.stop)
+
+        self.user = get_user_model().objects.create_user(
+            username='username', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def assertThrottled(self, res):
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn(int(res['Retry-After']), range(1, 31))
+
+    def test_items_throttled_per_user(self):
+        """Test a user is throttled after a burst, other users are not"""
+        url = reverse('todo:todoitem-list')
+        for _ in range(2):
+            self.client.get(url, {'all': 'true'})
+
+        self.assertThrottled(self.client.get(url, {'all': 'true'}))
+
+        self.client.force_authenticate(user=get_user_model().objects
+                                       .create_user(username='username2'))
+        res = self.client.get(url, {'all': 'true'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_scopes_independent(self):
+        """Test each scope has its own buckets"""
+        for _ in range(2):
+            self.client.get(reverse('todo:todoitem-list'), {'all': 'true'})
+
+        res = self.client.get(reverse('todo:category-list'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_login_throttled_per_ip(self):
+        """Test logins from one address are throttled, also when valid"""
+        url = reverse('user:login')
+        payload = {'username': 'username', 'password': 'wrong'}
+        for _ in range(2):
+            APIClient().post(url, payload)
+
+        payload['password'] = 'password'
+        self.assertThrottled(APIClient().post(url, payload))
+        res = APIClient(REMOTE_ADDR='10.0.0.2').post(url, payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_async_endpoint_throttled(self):
+        """Test the async endpoints share the buckets of their scope"""
+        self.client.get(reverse('todo:category-list'))
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % (
+            LoginSerializer.get_token(self.user).access_token))
+        url = reverse('todo:async-category-list')
+        self.client.get(url)
+
+        self.assertThrottled(self.client.get(url))
+
+
+@override_settings(METRICS_SAMPLE_RATE=1)
+class InstrumentationMiddlewareTests(TestCase):
+    """Test the request instrumentation and the metrics endpoint"""
+
+    def setUp(self):
+        for histogram in HISTOGRAMS:
+            histogram.reset()
+            self.addCleanup(histogram.reset)
+        self.user = get_user_model().objects.create_user(
+            username='username', password='password')
+        self.category = Category.objects.create(user=self.user, name='cat')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def get_server_timing(self, res):
+        return dict(
+            metric.strip().split(';', 1)
+            for metric in res['Server-Timing'].split(',')
+        )
+
+    def test_server_timing(self):
+        """Test sampled requests report their database and render time"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(reverse('todo:todoitem-list'),
+                                  {'category_id': self.category.id})
+
+        timing = self.get_server_timing(res)
+        self.assertEqual(set(timing), {'db', 'serialize', 'render', 'total'})
+        self.assertIn('desc="%d queries"' % len(queries), timing['db'])
+
+    async def test_server_timing_async_view(self):
+        """Test the queries of async views are counted under ASGI"""
+        token = LoginSerializer.get_token(self.user).access_token
+
+        # The async client of this Django version ignores the data of GET.
+        res = await AsyncClient().get(
+            '%s?category_id=%d' % (
+                reverse('todo:async-todoitem-list'), self.category.id),
+            authorization='Bearer %s' % token)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('desc="0 queries"',
+                         self.get_server_timing(res)['db'])
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        """Test unsampled requests only record wall time and size"""
+        res = self.client.get(reverse('todo:category-list'))
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertIn('category-list', request_duration._series)
+        self.assertIn('category-list', response_size._series)
+
+    def test_streaming_response(self):
+        """Test streaming responses are timed without reading the body"""
+        res = self.client.get(reverse('todo:export'))
+
+        self.assertTrue(res.streaming)
+        self.assertIn('export', request_duration._series)
+        self.assertNotIn('export', response_size._series)
+
+    def test_metrics(self):
+        """Test the histograms are exposed in the Prometheus format"""
+        self.client.get(reverse('todo:category-list'))
+        self.client.get(reverse('todo:category-list'))
+
+        res = self.client.get(reverse('metrics'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        lines = res.content.decode().splitlines()
+        self.assertIn(
+            '# TYPE todoapp_request_duration_seconds histogram', lines)
+        self.assertIn('todoapp_request_duration_seconds_bucket'
+                      '{view="category-list",le="+Inf"} 2', lines)
+        self.assertIn('todoapp_db_queries_count{view="category-list"} 2',
+                      lines)
+        self.assertTrue(any(
+            line.startswith('todoapp_category_cache_hits_total ')
+            for line in lines))
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_metrics_not_allowed(self):
+        """Test the metrics are hidden from other addresses"""
+        res = self.client.get(reverse('metrics'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class QueryBudgetTests(TestCase):
+    """Test the query budget and its N+1 detection"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='username', password='password')
+        self.categories = [
+            Category.objects.create(user=self.user, name='cat%d' % n)
+            for n in range(3)
+        ]
+
+    def test_within_budget(self):
+        """Test a block within its budget, savepoints not counted"""
+        with query_budget(2) as budget:
+            with transaction.atomic():
+                list(Category.objects.all())
+            Category.objects.filter(name='cat0').update(name='cat')
+
+        self.assertEqual(len(budget.queries), 2)
+
+    def test_over_budget(self):
+        """Test a block over its budget fails listing its queries"""
+        with self.assertRaises(AssertionError) as cm:
+            with query_budget(1):
+                list(Category.objects.all())
+                Category.objects.filter(name='cat0').update(name='cat')
+
+        message = str(cm.exception)
+        self.assertIn('2 queries, over the budget of 1', message)
+        self.assertIn('2. UPDATE', message)
+
+    def test_n_plus_one(self):
+        """Test repeating a SELECT fails with the stack of the repeat"""
+        with self.assertRaises(AssertionError) as cm:
+            with query_budget(10):
+                for category in Category.objects.all():
+                    category.todoitem_set.count()
+
+        message = str(cm.exception)
+        self.assertIn('Same SELECT run 3 times, likely N+1', message)
+        self.assertIn('category.todoitem_set.count()', message)
+        self.assertNotIn('querybudget.py', message)
+
+    def test_in_lists_same_shape(self):
+        """Test SELECTs differing in the length of an IN list repeat"""
+        with QueryBudget(max_repeats=2) as budget:
+            for n in range(1, 4):
+                list(Category.objects.filter(
+                    id__in=[c.id for c in self.categories[:n]]))
+
+        self.assertEqual(len(budget.shapes), 1)
+        self.assertEqual(len(budget.get_problems()), 1)
+
+    def test_decorator(self):
+        """Test the budget used as a decorator"""
+        @query_budget(1)
+        def list_categories():
+            return list(Category.objects.all())
+
+        self.assertEqual(len(list_categories()), 3)
+        with self.assertRaises(AssertionError):
+            query_budget(0)(list_categories)()
+
+
+@override_settings(DEBUG=True, QUERY_BUDGET=1, QUERY_BUDGET_MAX_REPEATS=2)
+class QueryBudgetMiddlewareTests(TestCase):
+    """Test the middleware logging requests over their query budget"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = get_user_model().objects.create_user(
+            username='username', password='password')
+
+    def get_response(self, request):
+        request.resolver_match = resolve(reverse('todo:category-list'))
+        for _ in range(self.queries):
+            Category.objects.filter(user=self.user).exists()
+        return HttpResponse()
+
+    async def get_async_response(self, request):
+        return await sync_to_async(self.get_response)(request)
+
+    def call(self, queries):
+        self.queries = queries
+        return QueryBudgetMiddleware(self.get_response)(self.factory.get('/'))
+
+    def test_within_budget(self):
+        """Test requests within the budget are not logged"""
+        with self.assertRaises(AssertionError), \
+                self.assertLogs('todoapp.querybudget'):
+            self.call(1)
+
+    def test_over_budget(self):
+        """Test requests over the budget are logged with their queries"""
+        with self.assertLogs('todoapp.querybudget', 'WARNING') as logs:
+            response = self.call(2)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Query budget exceeded by GET /', logs.output[0])
+        self.assertIn('2 queries, over the budget of 1', logs.output[0])
+        self.assertNotIn('N+1', logs.output[0])
+
+    async def test_over_budget_async(self):
+        """Test the queries of async views are checked under ASGI"""
+        self.queries = 2
+        middleware = QueryBudgetMiddleware(self.get_async_response)
+
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        with self.assertLogs('todoapp.querybudget', 'WARNING') as logs:
+            response = await middleware(self.factory.get('/'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('2 queries, over the budget of 1', logs.output[0])
+
+    def test_n_plus_one(self):
+        """Test requests repeating a SELECT are logged"""
+        with patch.object(CategoryViewSet, 'query_budget', 5, create=True), \
+                self.assertLogs('todoapp.querybudget', 'WARNING') as logs:
+            self.call(3)
+
+        self.assertIn('likely N+1', logs.output[0])
+
+    def test_view_budget(self):
+        """Test the query_budget of the view overrides the setting"""
+        with patch.object(CategoryViewSet, 'query_budget', 2, create=True), \
+                self.assertRaises(AssertionError), \
+                self.assertLogs('todoapp.querybudget'):
+            self.call(2)
+
+    @override_settings(DEBUG=False)
+    def test_not_used_without_debug(self):
+        """Test the middleware is left out unless DEBUG is on"""
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryBudgetMiddleware(self.get_response)
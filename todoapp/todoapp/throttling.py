@@ -0,0 +1,181 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import ScopedRateThrottle
+
+
+class LocalBucketStore:
+    """
+    Token buckets in process memory.
+
+    Exact and cheap, but every worker process keeps its own buckets, so a
+    client gets the rate once per process.
+    """
+    # Least recently used buckets are dropped beyond this many keys.
+    max_keys = 100000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def consume(self, key, capacity, period, now=None):
+        """
+        Take a token from the bucket of `key`, which holds up to `capacity`
+        tokens and refills them over `period` seconds.
+
+        Returns None when a token was taken, else the seconds until one is
+        available.
+        """
+        now = time.monotonic() if now is None else now
+        rate = capacity / period
+        with self._lock:
+            tokens, updated, _, _ = self._buckets.get(
+                key, (capacity, now, capacity, rate))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, capacity, rate)
+                self._buckets.move_to_end(key)
+                return (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1, now, capacity, rate)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return None
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def _prune(self, now):
+        # The least recently used buckets that are full again by their own
+        # size and rate are dropped, as a missing bucket starts full. Each
+        # bucket is dropped once, so this is cheap over many calls. If that
+        # is not enough the least recently used one goes anyway: its client
+        # gets a full bucket early.
+        while self._buckets:
+            key, (tokens, updated, capacity, rate) = next(
+                iter(self._buckets.items()))
+            if tokens + (now - updated) * rate < capacity:
+                break
+            del self._buckets[key]
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+
+class CacheBucketStore:
+    """
+    Token buckets in a Django cache shared by all worker processes.
+
+    A bucket is a start time plus an atomically incremented count of the
+    tokens taken since, so concurrent requests never read-modify-write
+    it: the count must stay within what refilled since the start. Both
+    keys expire when the bucket would be full again, which restarts it.
+    Concurrent restarts may let a few requests more through.
+    """
+    key_prefix = 'throttle'
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE]
+
+    def consume(self, key, capacity, period, now=None):
+        now = time.time() if now is None else now
+        rate = capacity / period
+        start_key = '%s:%s' % (self.key_prefix, key)
+
+        start = self.cache.get(start_key)
+        if start is None:
+            # A new bucket starts full.
+            self.cache.add(start_key, now - period, int(period) + 1)
+            start = self.cache.get(start_key, now - period)
+        count_key = '%s:%r' % (start_key, start)
+        try:
+            count = self.cache.incr(count_key)
+        except ValueError:
+            count = 1 if self.cache.add(count_key, 1, int(period) + 1) \
+                else self.cache.incr(count_key)
+
+        allowance = (now - start) * rate
+        if count > allowance:
+            self.cache.decr(count_key)
+            return (count - allowance) / rate
+        if allowance - count > capacity - 1:
+            # Full again before the keys expired: restart it, less this
+            # token.
+            self.cache.set(start_key, now - period + 1 / rate,
+                           math.ceil(1 / rate))
+            return None
+        timeout = math.ceil((count + capacity - allowance) / rate)
+        self.cache.touch(start_key, timeout)
+        self.cache.touch(count_key, timeout)
+        return None
+
+    def reset(self):
+        self.cache.clear()
+
+
+BUCKET_STORES = {
+    'local': LocalBucketStore,
+    'cache': CacheBucketStore,
+}
+_bucket_stores = {}
+_bucket_stores_lock = threading.Lock()
+
+
+def get_bucket_store():
+    name = settings.THROTTLE_STORE
+    store = _bucket_stores.get(name)
+    if store is not None:
+        return store
+    with _bucket_stores_lock:
+        if name not in _bucket_stores:
+            try:
+                _bucket_stores[name] = BUCKET_STORES[name]()
+            except KeyError:
+                raise ImproperlyConfigured(
+                    'Unknown THROTTLE_STORE %r, use one of %s' % (
+                        name, ', '.join(BUCKET_STORES)))
+        return _bucket_stores[name]
+
+
+class UserTokenBucketThrottle(ScopedRateThrottle):
+    """
+    Token bucket per user, or per client IP for anonymous requests, in the
+    `throttle_scope` of the view.
+
+    The rate of a scope, like '600/min', is the bucket size as well as
+    what it refills over the period, so a client may burst a full period's
+    requests at once.
+    """
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+
+        self.retry_after = get_bucket_store().consume(
+            self.get_cache_key(request, view),
+            self.num_requests, self.duration)
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPTokenBucketThrottle(UserTokenBucketThrottle):
+    """Token bucket per client IP, also for authenticated requests."""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
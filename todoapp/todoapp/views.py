@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from todoapp.metrics import HISTOGRAMS
+from todos.cache import category_list_cache
+
+
+def metrics(request):
+    """The metrics of this process in the Prometheus text format."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.collect())
+    for name, value in category_list_cache.stats().items():
+        lines.extend([
+            '# HELP todoapp_category_cache_%s_total Category list cache '
+            '%s.' % (name, name),
+            '# TYPE todoapp_category_cache_%s_total counter' % name,
+            'todoapp_category_cache_%s_total %d' % (name, value),
+        ])
+    return HttpResponse(
+        '\n'.join(lines) + '\n',
+        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,58 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from todos.models import TodoItem, TodoItemArchive
+from todos.sync import delete_items, next_sequence
+
+
+# Items moved per batch. A user's share of a batch is moved in one
+# transaction holding their sequence lock, so their own writes wait for
+# at most that many items.
+BATCH_SIZE = 500
+ARCHIVE_FIELDS = (
+    'id', 'category_id', 'name', 'done', 'date_created', 'updated_at')
+
+
+def get_archivable_items(before):
+    """Done items not changed since `before`."""
+    return TodoItem.objects.filter(done=True, updated_at__lt=before)
+
+
+def archive_batch(before, item_ids_by_user):
+    """
+    Move items of users to the archive, one short transaction per user.
+
+    The user's sequence row is locked first, as by every item write, and
+    the items are read again under it: an item changed meanwhile is left
+    in place. The archived items are deleted from TodoItem like through
+    the API, so they leave tombstones for sync and the category counters
+    drop them.
+    """
+    archived = 0
+    for user_id, item_ids in sorted(item_ids_by_user.items()):
+        with transaction.atomic():
+            seq = next_sequence(user_id)
+            items = list(get_archivable_items(before).filter(
+                id__in=item_ids).values_list(*ARCHIVE_FIELDS, named=True))
+            TodoItemArchive.objects.bulk_create(
+                TodoItemArchive(**item._asdict()) for item in items)
+            delete_items(user_id, items, seq)
+        archived += len(items)
+    return archived
+
+
+def archive_items(before, batch_size=BATCH_SIZE):
+    """
+    Archive the done items not changed since `before`, oldest first, and
+    yield the number of items archived per batch.
+    """
+    while True:
+        batch = get_archivable_items(before).order_by('updated_at')\
+            .values_list('id', 'category__user_id')[:batch_size]
+        item_ids_by_user = defaultdict(list)
+        for item_id, user_id in batch:
+            item_ids_by_user[user_id].append(item_id)
+        if not item_ids_by_user:
+            return
+        yield archive_batch(before, item_ids_by_user)
@@ -0,0 +1,168 @@
+import json
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, \
+    NotFound, ParseError, Throttled, ValidationError
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from todos.cache import category_list_cache
+from todos.conditional import get_list_validators, \
+    get_not_modified_response, set_list_validators
+from todos.models import TodoItem
+from todos.pagination import KeysetPagination
+from todos.serializers import CategorySerializer, TodoItemSerializer, \
+    TodoItemListSerializer
+from todos.services import get_category_list_entry, get_items_version, \
+    save_category, save_item
+from user.authentication import StatelessJWTAuthentication
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async counterpart of a DRF APIView.
+
+    DRF views are synchronous, so authentication and error handling are
+    done here; database work is handed to the thread-sensitive executor
+    through `sync_to_async`, as this Django version has no async ORM.
+    """
+    authenticator = StatelessJWTAuthentication()
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        dispatch_view = super().as_view(**initkwargs)
+
+        # Class-based views are not recognised as async on this Django
+        # version, so expose the dispatch coroutine as a function view.
+        async def view(request, *args, **kwargs):
+            return await dispatch_view(request, *args, **kwargs)
+
+        update_wrapper(view, dispatch_view)
+        # Token authenticated, like the DRF views; csrf_exempt() itself
+        # would hide the coroutine function behind a sync wrapper.
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            result = await sync_to_async(self.authenticator.authenticate)(
+                request)
+            if result is None:
+                raise NotAuthenticated()
+            request.user, request.auth = result
+            await sync_to_async(self.check_throttles)(request)
+
+            if request.method.lower() not in self.http_method_names or \
+                    not hasattr(self, request.method.lower()):
+                return self.http_method_not_allowed(request, *args, **kwargs)
+            handler = getattr(self, request.method.lower())
+            return await handler(request, *args, **kwargs)
+        except APIException as exc:
+            return self.handle_exception(exc)
+
+    def check_throttles(self, request):
+        waits = [
+            throttle.wait() for throttle in (
+                throttle_class() for throttle_class in self.throttle_classes)
+            if not throttle.allow_request(request, self)
+        ]
+        if waits:
+            raise Throttled(max(waits))
+
+    def handle_exception(self, exc):
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {'detail': exc.detail}
+        response = JsonResponse(data, status=exc.status_code, safe=False)
+        if getattr(exc, 'wait', None):
+            response['Retry-After'] = '%d' % exc.wait
+        if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+            response['WWW-Authenticate'] = \
+                self.authenticator.authenticate_header(request=None)
+        return response
+
+    def get_data(self, request):
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % exc)
+
+    def get_valid_serializer(self, serializer_class, request):
+        serializer = serializer_class(data=self.get_data(request))
+        if not serializer.is_valid():
+            raise ValidationError(serializer.errors)
+        return serializer
+
+
+class AsyncCategoryListView(AsyncAPIView):
+    throttle_scope = 'categories'
+
+    async def get(self, request):
+        user_id = request.user.id
+        entry = await sync_to_async(category_list_cache.get_or_set)(
+            user_id, lambda: get_category_list_entry(user_id))
+
+        response = get_not_modified_response(request, entry['etag']) or \
+            JsonResponse(entry['data'], safe=False)
+        return set_list_validators(
+            response, entry['etag'], entry['last_modified'])
+
+    async def post(self, request):
+        serializer = self.get_valid_serializer(CategorySerializer, request)
+        await sync_to_async(save_category)(serializer, request.user.id)
+        return JsonResponse(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AsyncTodoItemListView(AsyncAPIView):
+    throttle_scope = 'items'
+
+    async def get(self, request):
+        try:
+            category_id = int(request.GET['category_id'])
+        except (KeyError, ValueError):
+            raise ValidationError('Invalid category id')
+
+        user_id = request.user.id
+        queryset = TodoItem.objects.filter(
+            category_id=category_id, category__user_id=user_id)
+        version, last_modified = await sync_to_async(get_items_version)(
+            user_id, [category_id])
+        etag, last_modified = get_list_validators(
+            version, last_modified, request.get_full_path())
+
+        response = get_not_modified_response(request, etag)
+        if response is None:
+            paginator = KeysetPagination()
+            page = await sync_to_async(paginator.paginate_queryset)(
+                TodoItemListSerializer.get_rows(queryset), Request(request))
+            response = JsonResponse({
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'results': TodoItemListSerializer(page).data,
+            })
+        return set_list_validators(response, etag, last_modified)
+
+    async def post(self, request):
+        serializer = self.get_valid_serializer(TodoItemSerializer, request)
+        await sync_to_async(save_item)(serializer, request.user.id)
+        return JsonResponse(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AsyncTodoItemDetailView(AsyncAPIView):
+    throttle_scope = 'items'
+
+    async def get(self, request, pk):
+        try:
+            item = await sync_to_async(TodoItem.objects.filter(
+                category__user_id=request.user.id).get)(id=pk)
+        except ObjectDoesNotExist:
+            raise NotFound('Invalid item pk')
+        return JsonResponse(TodoItemSerializer(item).data)
@@ -0,0 +1,60 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+class CategoryListCache:
+    """Per-user cache of the serialized category list."""
+    key_prefix = 'todos:categories'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[settings.TODOS_CATEGORY_CACHE]
+
+    def get_key(self, user_id):
+        return '%s:%s' % (self.key_prefix, user_id)
+
+    def get_or_set(self, user_id, default):
+        key = self.get_key(user_id)
+        data = self.cache.get(key)
+        if data is not None:
+            self._count(hit=True)
+            return data
+
+        self._count(hit=False)
+        data = default()
+        self.cache.set(key, data, settings.TODOS_CATEGORY_CACHE_TIMEOUT)
+        return data
+
+    def invalidate(self, user_id):
+        key = self.get_key(user_id)
+        self.cache.delete(key)
+        # Until the write commits, a reader missing the entry fills it from
+        # the rows committed before, so it is deleted again on commit.
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self.cache.delete(key))
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+category_list_cache = CategoryListCache()
@@ -0,0 +1,26 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+def get_list_validators(version, last_modified, *extra):
+    """Build the (ETag, Last-Modified) pair of a list response."""
+    token = ':'.join(
+        str(part) for part in (version, last_modified) + extra)
+    etag = '"%s"' % hashlib.md5(token.encode()).hexdigest()
+    return etag, last_modified
+
+
+def get_not_modified_response(request, etag):
+    # Only the ETag decides: Last-Modified has a resolution of seconds, so
+    # If-Modified-Since alone misses changes within the same second.
+    return get_conditional_response(request, etag=etag)
+
+
+def set_list_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_vary_headers(response, ('Authorization',))
+    return response
@@ -0,0 +1,68 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from todos.cache import category_list_cache
+from todos.models import Category, TodoItem
+
+
+class ItemCountChanges:
+    """
+    Changes to the item_count and done_count of categories.
+
+    Collected while items are written and applied in the same transaction
+    with one F() update per category, which also stamps the category as
+    changed for conditional requests and sync: the categories of items
+    written without changing their counts, like renames, are stamped too.
+    """
+
+    def __init__(self):
+        self.changes = defaultdict(lambda: [0, 0])
+
+    def add(self, category_id, done, delta=1):
+        change = self.changes[category_id]
+        change[0] += delta
+        if done:
+            change[1] += delta
+
+    def remove(self, category_id, done):
+        self.add(category_id, done, -1)
+
+    def apply(self, user_id, seq):
+        now = timezone.now()
+        for category_id, (items, done) in self.changes.items():
+            Category.objects.filter(id=category_id).update(
+                item_count=F('item_count') + items,
+                done_count=F('done_count') + done,
+                updated_at=now,
+                seq=seq,
+            )
+        if self.changes:
+            category_list_cache.invalidate(user_id)
+        self.changes.clear()
+
+
+def get_actual_counts():
+    items = TodoItem.objects.filter(category=OuterRef('pk'))\
+        .order_by().values('category')
+    return {
+        'item_count': Coalesce(Subquery(
+            items.annotate(count=Count('id')).values('count')), 0),
+        'done_count': Coalesce(Subquery(
+            items.filter(done=True).annotate(count=Count('id'))
+            .values('count')), 0),
+    }
+
+
+def get_miscounted_categories(categories=None):
+    if categories is None:
+        categories = Category.objects.all()
+    return categories.annotate(**{
+        'actual_%s' % name: count
+        for name, count in get_actual_counts().items()
+    }).filter(
+        ~Q(item_count=F('actual_item_count')) |
+        ~Q(done_count=F('actual_done_count'))
+    )
@@ -0,0 +1,75 @@
+from itertools import islice
+
+from todoapp.renderers import dumps
+from todos.models import Category, TodoItem
+from todos.serializers import CategorySerializer, TodoItemListSerializer
+
+
+CHUNK_SIZE = 2000
+# Categories per item query: its IN list binds one parameter per id, and
+# SQLite before 3.32 allows 999 per query.
+CATEGORY_BATCH_SIZE = 500
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def export_chunks(user_id):
+    """
+    Yield ('categories' or 'items', serialized records) for all todos of a
+    user, chunk by chunk.
+
+    Rows are read through database cursors with `iterator()`, so memory
+    stays bounded by the chunk size however large the account is; items
+    are read per batch of categories in the order of their index.
+    """
+    chunk_size = CHUNK_SIZE
+    category_ids = []
+    categories = Category.objects.filter(user_id=user_id)\
+        .order_by('name').iterator(chunk_size)
+    for chunk in chunked(categories, chunk_size):
+        category_ids += [category.id for category in chunk]
+        yield 'categories', CategorySerializer(chunk, many=True).data
+
+    category_ids.sort()
+    for start in range(0, len(category_ids), CATEGORY_BATCH_SIZE):
+        items = TodoItem.objects.filter(
+            category_id__in=category_ids[start:start + CATEGORY_BATCH_SIZE]
+        ).order_by('category_id', '-date_created', '-id')
+        rows = TodoItemListSerializer.get_rows(items).iterator(chunk_size)
+        for chunk in chunked(rows, chunk_size):
+            yield 'items', TodoItemListSerializer(chunk).data
+
+
+def stream_ndjson(user_id):
+    """One JSON object per line, typed 'category' or 'item'."""
+    types = {'categories': 'category', 'items': 'item'}
+    for section, records in export_chunks(user_id):
+        yield b''.join(
+            dumps({'type': types[section], **record}) + b'\n'
+            for record in records
+        )
+
+
+def stream_json(user_id):
+    """A {"categories": [...], "items": [...]} document."""
+    sections = iter((b'categories', b'items'))
+    section = next(sections)
+    yield b'{"%s":[' % section
+    separator = b''
+    for chunk_section, records in export_chunks(user_id):
+        while chunk_section.encode() != section:
+            section = next(sections)
+            yield b'],"%s":[' % section
+            separator = b''
+        yield separator + b','.join(dumps(record) for record in records)
+        separator = b','
+    for section in sections:
+        yield b'],"%s":[' % section
+    yield b']}'
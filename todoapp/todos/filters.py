@@ -0,0 +1,56 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+
+class TodoItemFilter(BaseFilterBackend):
+    """Filter items by `done=true|false` and by a name `prefix`."""
+    done_values = {'true': True, 'false': False}
+
+    def filter_queryset(self, request, queryset, view):
+        done = request.query_params.get('done')
+        if done is not None:
+            try:
+                queryset = queryset.filter(
+                    done=self.done_values[done.lower()])
+            except KeyError:
+                raise ValidationError('Invalid done filter')
+
+        prefix = request.query_params.get('prefix')
+        if prefix:
+            queryset = queryset.filter(name__istartswith=prefix)
+        return queryset
+
+
+class TodoItemOrderingFilter(OrderingFilter):
+    """
+    Order items by one of the `ordering_keys`.
+
+    Each key is a total ordering in the order of an item index, so the
+    database reads it without a sort; a request in the other direction
+    reverses the whole key. Items of several categories are grouped per
+    category, otherwise the leading category is dropped.
+    """
+    ordering_keys = {
+        'date_created': ('category_id', '-date_created', '-id'),
+        'name': ('category_id', 'name', 'id'),
+        'done': ('category_id', 'done', '-date_created', '-id'),
+    }
+    ordering_fields = tuple(ordering_keys)
+
+    def get_ordering(self, request, queryset, view):
+        term = request.query_params.get(self.ordering_param) or \
+            self.get_default_ordering(view)[0]
+        if term.lstrip('-') not in self.ordering_keys:
+            raise ValidationError('Invalid ordering, use one of %s' % (
+                ', '.join(self.ordering_fields)))
+
+        ordering = self.ordering_keys[term.lstrip('-')]
+        if ordering[1].startswith('-') != term.startswith('-'):
+            ordering = tuple(
+                field[1:] if field.startswith('-') else '-' + field
+                for field in ordering
+            )
+        category_ids = getattr(view, 'category_ids', ())
+        if category_ids is None or len(category_ids) > 1:
+            return ordering
+        return ordering[1:]
@@ -0,0 +1,178 @@
+import csv
+import json
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from todos.cache import category_list_cache
+from todos.counters import ItemCountChanges
+from todos.export import chunked
+from todos.models import Category, TodoItem
+from todos.sync import next_sequence
+
+
+# Items inserted per transaction.
+CHUNK_SIZE = 5000
+# Category names per lookup query: it binds the user and one parameter
+# per name, within the 999 that SQLite before 3.32 allows.
+CATEGORY_BATCH_SIZE = 500
+MAX_NAME_LENGTH = TodoItem._meta.get_field('name').max_length
+
+CSV_DONE_VALUES = {
+    '': False, '0': False, 'false': False, 'no': False,
+    '1': True, 'true': True, 'yes': True,
+}
+
+
+def decode_lines(lines):
+    for number, line in enumerate(lines, 1):
+        try:
+            yield line.decode('utf-8') if isinstance(line, bytes) else line
+        except UnicodeDecodeError:
+            raise ValidationError('Line %d: Invalid UTF-8' % number)
+
+
+def check_name(number, name, field='name'):
+    # Trimmed like the serializers do.
+    if isinstance(name, str):
+        name = name.strip()
+    if not isinstance(name, str) or not name:
+        raise ValidationError('Line %d: Invalid %s' % (number, field))
+    if len(name) > MAX_NAME_LENGTH:
+        raise ValidationError('Line %d: %s is longer than %d characters' % (
+            number, field.capitalize(), MAX_NAME_LENGTH))
+    return name
+
+
+def read_ndjson(lines):
+    """
+    Read the records of an NDJSON export.
+
+    Items name their category with `category`, or refer to an earlier
+    category record with `category_id` as exported.
+    """
+    category_names = {}
+    for number, line in enumerate(decode_lines(lines), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise ValidationError('Line %d: Invalid JSON' % number)
+        if not isinstance(record, dict):
+            raise ValidationError('Line %d: Invalid record' % number)
+
+        if record.get('type') == 'category':
+            name = check_name(number, record.get('name'))
+            if isinstance(record.get('id'), int):
+                category_names[record['id']] = name
+            yield name, None, False
+        elif record.get('type') == 'item':
+            if 'category' in record:
+                category = check_name(
+                    number, record['category'], 'category')
+            elif isinstance(record.get('category_id'), int) and \
+                    record['category_id'] in category_names:
+                category = category_names[record['category_id']]
+            else:
+                raise ValidationError('Line %d: Invalid category' % number)
+            done = record.get('done', False)
+            if not isinstance(done, bool):
+                raise ValidationError('Line %d: Invalid done' % number)
+            yield category, check_name(number, record.get('name')), done
+        else:
+            raise ValidationError('Line %d: Invalid record type' % number)
+
+
+def read_csv(lines):
+    """Read items from CSV rows with category, name and done columns."""
+    reader = csv.DictReader(decode_lines(lines))
+    if not {'category', 'name'} <= set(reader.fieldnames or ()):
+        raise ValidationError('CSV header must include category and name')
+    for row in reader:
+        try:
+            done = CSV_DONE_VALUES[(row.get('done') or '').strip().lower()]
+        except KeyError:
+            raise ValidationError('Line %d: Invalid done' % reader.line_num)
+        yield (
+            check_name(reader.line_num, row['category'], 'category'),
+            check_name(reader.line_num, row['name']),
+            done,
+        )
+
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+def resolve_categories(user_id, names, seq):
+    """
+    Return the ids of the user's categories by name, creating the missing
+    ones, and the number created.
+
+    Conflicting inserts are ignored by the (user, name) constraint, so a
+    category created concurrently is simply looked up.
+    """
+    category_ids = {}
+    created = 0
+    for batch in chunked(names, CATEGORY_BATCH_SIZE):
+        existing = dict(Category.objects.filter(
+            user_id=user_id, name__in=batch).values_list('name', 'id'))
+        missing = [name for name in batch if name not in existing]
+        if missing:
+            Category.objects.bulk_create([
+                Category(user_id=user_id, name=name, seq=seq)
+                for name in missing
+            ], ignore_conflicts=True)
+            for name, category_id, category_seq in Category.objects.filter(
+                    user_id=user_id, name__in=missing)\
+                    .values_list('name', 'id', 'seq'):
+                existing[name] = category_id
+                created += category_seq == seq
+        category_ids.update(existing)
+    return category_ids, created
+
+
+def import_todos(user_id, file, input_format, progress=None):
+    """
+    Import the categories and items of an NDJSON or CSV file for a user.
+
+    The file is read twice: the first pass validates every line and
+    collects the category names, so an invalid file imports nothing. The
+    categories are then resolved at once and the items inserted with
+    `bulk_create` in transactions of `CHUNK_SIZE` items, keeping the sync
+    sequence and the category counters in step. `progress` is called with
+    the running totals after each chunk.
+    """
+    read = READERS[input_format]
+    file.seek(0)
+    names = list(dict.fromkeys(
+        category for category, _, _ in read(file)))
+
+    with transaction.atomic():
+        seq = next_sequence(user_id)
+        category_ids, created = resolve_categories(user_id, names, seq)
+    totals = {'categories': created, 'items': 0}
+    if created:
+        category_list_cache.invalidate(user_id)
+
+    file.seek(0)
+    items = (
+        TodoItem(category_id=category_ids[category], name=name, done=done)
+        for category, name, done in read(file) if name is not None
+    )
+    for chunk in chunked(items, CHUNK_SIZE):
+        counts = ItemCountChanges()
+        with transaction.atomic():
+            seq = next_sequence(user_id)
+            for item in chunk:
+                item.seq = seq
+                counts.add(item.category_id, item.done)
+            TodoItem.objects.bulk_create(chunk)
+            counts.apply(user_id, seq)
+        totals['items'] += len(chunk)
+        if progress is not None:
+            progress(totals)
+    return totals
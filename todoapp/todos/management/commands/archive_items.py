@@ -0,0 +1,46 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from todos.archive import BATCH_SIZE, archive_items, get_archivable_items
+
+
+class Command(BaseCommand):
+    help = 'Move done items unchanged for a number of days to the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=30,
+            help='Done items unchanged for this many days are archived')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Items moved per batch')
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to wait between batches, to leave the database '
+                 'to other writers')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count the items that would be archived')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        if options['dry_run']:
+            self.stdout.write('%d items would be archived' % (
+                get_archivable_items(before).count()))
+            return
+
+        started = time.perf_counter()
+        total = 0
+        for archived in archive_items(before, options['batch_size']):
+            total += archived
+            elapsed = time.perf_counter() - started
+            self.stdout.write('%d items  %.1f items/s' % (
+                total, total / elapsed))
+            time.sleep(options['pause'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            'Archived %d items in %.1f s' % (total, elapsed)))
@@ -0,0 +1,279 @@
+import itertools
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from types import SimpleNamespace
+from unittest.mock import patch
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from todoapp.throttling import UserTokenBucketThrottle
+from todos.management.commands.bench_export import create_account, \
+    delete_account
+from todos.management.commands.loadtest import percentile
+from todos.models import Category, TodoItem
+
+
+PASSWORD = 'bench-password'
+ENDPOINTS = (
+    'login', 'category_list', 'category_create', 'item_list', 'item_create',
+    'item_patch', 'item_delete',
+)
+
+
+class ClientTransport:
+    """Requests through the Django test client, in this process."""
+
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, data=None, token=None):
+        extra = {}
+        if token is not None:
+            extra['HTTP_AUTHORIZATION'] = 'Bearer ' + token
+        response = self.client.generic(
+            method, path, json.dumps(data) if data is not None else '',
+            content_type='application/json', **extra)
+        return response.status_code, response.content
+
+
+class HTTPTransport:
+    """Requests to a running server sharing the database."""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token is not None:
+            headers['Authorization'] = 'Bearer ' + token
+        request = Request(
+            self.base_url + path, method=method, headers=headers,
+            data=json.dumps(data).encode() if data is not None else None)
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except HTTPError as e:
+            return e.code, e.read()
+        except (URLError, OSError):
+            return 0, b''
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the throughput and latency of the main API endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--items', type=int, default=10000,
+            help='Items generated, spread over the users')
+        parser.add_argument(
+            '--categories', type=int, default=100,
+            help='Categories generated per user')
+        parser.add_argument(
+            '--users', type=int, default=4,
+            help='Users generated, requests go to each in turn')
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            choices=ENDPOINTS,
+            help='Endpoint to measure (repeatable, default: all)')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument(
+            '--base-url',
+            help='Server to test, e.g. http://127.0.0.1:8000, using this '
+                 'database; the requests go through the test client '
+                 'otherwise')
+        parser.add_argument(
+            '--concurrency', type=int, default=16,
+            help='Concurrent requests to the server, the test client '
+                 'sends one at a time')
+        parser.add_argument('--timeout', type=float, default=10)
+        parser.add_argument(
+            '--label', default='',
+            help='Label stored with the results, e.g. a version')
+        parser.add_argument(
+            '--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('At least one user is needed')
+        if options['base_url']:
+            self.transport = HTTPTransport(
+                options['base_url'], options['timeout'])
+            concurrency = options['concurrency']
+        else:
+            self.transport = ClientTransport()
+            concurrency = 1
+        self.category_numbers = itertools.count()
+        # The items created, as (account, id), for item_delete to delete.
+        self.created = []
+
+        users = [
+            get_user_model().objects.create_user(
+                username='bench-api-%d-%d' % (os.getpid(), n),
+                password=PASSWORD)
+            for n in range(options['users'])
+        ]
+        try:
+            started = time.perf_counter()
+            for n, user in enumerate(users):
+                create_account(
+                    user, options['categories'],
+                    options['items'] // len(users) +
+                    (n < options['items'] % len(users)))
+            self.stdout.write('generated %d items in %.1f s' % (
+                options['items'], time.perf_counter() - started))
+
+            with ExitStack() as stack:
+                if not options['base_url']:
+                    # The server's throttles are set in its environment.
+                    stack.enter_context(
+                        override_settings(ALLOWED_HOSTS=['testserver']))
+                    stack.enter_context(patch.dict(
+                        UserTokenBucketThrottle.THROTTLE_RATES,
+                        dict.fromkeys(
+                            UserTokenBucketThrottle.THROTTLE_RATES)))
+                self.accounts = [self.get_account(user) for user in users]
+                results = []
+                for endpoint in options['endpoints'] or ENDPOINTS:
+                    function = getattr(self, endpoint)
+                    if endpoint == 'item_delete':
+                        missing = options['warmup'] + options['requests'] - \
+                            len(self.created)
+                        if missing > 0:
+                            self.run(self.item_create, missing, concurrency)
+                    self.run(function, options['warmup'], concurrency)
+                    result = self.run(
+                        function, options['requests'], concurrency)
+                    result['endpoint'] = endpoint
+                    results.append(result)
+                    line = '%(endpoint)-16s %(rps)9.1f req/s  p50 ' \
+                        '%(p50_ms)7.2f ms  p95 %(p95_ms)7.2f ms  p99 ' \
+                        '%(p99_ms)7.2f ms  errors %(errors)d' % result
+                    if result['errors']:
+                        line += ' (%s)' % ', '.join(
+                            '%s: %d' % status for status in sorted(
+                                result['error_statuses'].items()))
+                    self.stdout.write(line)
+        finally:
+            for user in users:
+                delete_account(user)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'label': options['label'],
+                    'transport': 'http' if options['base_url'] else 'client',
+                    'users': options['users'],
+                    'categories': options['categories'],
+                    'items': options['items'],
+                    'results': results,
+                }, f, indent=2)
+
+    def get_account(self, user):
+        status, body = self.transport.request(
+            'POST', reverse('user:login'),
+            {'username': user.username, 'password': PASSWORD})
+        if status != 200:
+            raise CommandError('Login failed with status %d' % status)
+        return SimpleNamespace(
+            user=user,
+            token=json.loads(body)['access'],
+            category_ids=list(Category.objects.filter(user=user)
+                              .order_by('id').values_list('id', flat=True)),
+            item_ids=list(TodoItem.objects.filter(category__user=user)
+                          .order_by('id').values_list('id', flat=True)[:1000]),
+        )
+
+    def run(self, function, requests, concurrency):
+        def timed(n):
+            started = time.perf_counter()
+            status = function(self.accounts[n % len(self.accounts)], n)
+            return time.perf_counter() - started, status
+
+        started = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                samples = list(executor.map(timed, range(requests)))
+        else:
+            samples = [timed(n) for n in range(requests)]
+        elapsed = time.perf_counter() - started
+
+        latencies = [
+            latency for latency, status in samples if 200 <= status < 300]
+        # Status 0 is a request that got no response.
+        error_statuses = Counter(
+            str(status) for _, status in samples
+            if not 200 <= status < 300)
+        return {
+            'requests': requests,
+            'concurrency': concurrency,
+            'errors': len(samples) - len(latencies),
+            'error_statuses': dict(error_statuses),
+            'rps': requests / elapsed if elapsed else 0,
+            'p50_ms': 1000 * (percentile(latencies, 0.50) or 0),
+            'p95_ms': 1000 * (percentile(latencies, 0.95) or 0),
+            'p99_ms': 1000 * (percentile(latencies, 0.99) or 0),
+        }
+
+    # An endpoint takes the account and number of a request, sends it and
+    # returns the response status.
+
+    def login(self, account, n):
+        return self.transport.request('POST', reverse('user:login'), {
+            'username': account.user.username, 'password': PASSWORD})[0]
+
+    def category_list(self, account, n):
+        return self.transport.request(
+            'GET', reverse('todo:category-list'), token=account.token)[0]
+
+    def category_create(self, account, n):
+        return self.transport.request(
+            'POST', reverse('todo:category-list'),
+            {'name': 'bench new %d' % next(self.category_numbers)},
+            token=account.token)[0]
+
+    def item_list(self, account, n):
+        category_id = account.category_ids[n % len(account.category_ids)]
+        return self.transport.request(
+            'GET', '%s?category_id=%d' % (
+                reverse('todo:todoitem-list'), category_id),
+            token=account.token)[0]
+
+    def item_create(self, account, n):
+        status, body = self.transport.request(
+            'POST', reverse('todo:todoitem-list'), {
+                'name': 'bench new %d' % n,
+                'category_id':
+                    account.category_ids[n % len(account.category_ids)],
+            }, token=account.token)
+        if status == 201:
+            self.created.append((account, json.loads(body)['id']))
+        return status
+
+    def item_patch(self, account, n):
+        if not account.item_ids:
+            return 0
+        return self.transport.request(
+            'PATCH', reverse('todo:todoitem-detail', args=[
+                account.item_ids[n % len(account.item_ids)]]),
+            {'done': n % 2 == 0}, token=account.token)[0]
+
+    def item_delete(self, account, n):
+        # Deletes the items created before, of whichever account.
+        try:
+            account, item_id = self.created.pop()
+        except IndexError:
+            return 0
+        return self.transport.request(
+            'DELETE', reverse('todo:todoitem-detail', args=[item_id]),
+            token=account.token)[0]
@@ -0,0 +1,101 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+
+from todos.management.commands.loadtest import percentile
+from todos.models import Category, TodoItem
+from todos.sync import next_sequence
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent item writes against the configured database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, action='append', dest='threads',
+            help='Concurrent writers (repeatable, default: 1, 4 and 16)')
+        parser.add_argument(
+            '--writes', type=int, default=200,
+            help='Item creates per writer')
+        parser.add_argument(
+            '--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        self.stdout.write('mode=%s engine=%s conn_max_age=%s' % (
+            os.environ.get('DJANGO_DB', 'sqlite'), database['ENGINE'],
+            database['CONN_MAX_AGE']))
+
+        results = []
+        for threads in options['threads'] or [1, 4, 16]:
+            result = self.run(threads, options['writes'])
+            results.append(result)
+            self.stdout.write(
+                'threads %(threads)3d  %(writes_per_second)9.1f writes/s  '
+                'p50 %(p50_ms)7.2f ms  p99 %(p99_ms)7.2f ms  '
+                'errors %(errors)d' % result)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def run(self, threads, writes):
+        # One user per writer, so only the database itself is contended.
+        users = [
+            get_user_model().objects.create_user(
+                username='bench-writes-%d-%d' % (os.getpid(), n))
+            for n in range(threads)
+        ]
+        try:
+            categories = [
+                Category.objects.create(name='bench', user=user)
+                for user in users
+            ]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                samples = list(executor.map(
+                    lambda category: self.write(category, writes),
+                    categories))
+            elapsed = time.perf_counter() - started
+        finally:
+            for user in users:
+                user.delete()
+
+        latencies = [
+            latency for writer_latencies, _ in samples
+            for latency in writer_latencies
+        ]
+        errors = sum(writer_errors for _, writer_errors in samples)
+        return {
+            'threads': threads,
+            'writes': threads * writes,
+            'errors': errors,
+            'writes_per_second': len(latencies) / elapsed if elapsed else 0,
+            'p50_ms': 1000 * (percentile(latencies, 0.50) or 0),
+            'p95_ms': 1000 * (percentile(latencies, 0.95) or 0),
+            'p99_ms': 1000 * (percentile(latencies, 0.99) or 0),
+        }
+
+    def write(self, category, writes):
+        latencies, errors = [], 0
+        try:
+            for n in range(writes):
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        TodoItem.objects.create(
+                            category=category, name='item %d' % n,
+                            seq=next_sequence(category.user_id))
+                except OperationalError:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - started)
+        finally:
+            connection.close()
+        return latencies, errors
@@ -0,0 +1,126 @@
+import json
+import os
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from todos.models import Category, TodoItem
+from todos.sync import next_sequence
+from todos.views import ExportView
+
+
+BATCH_SIZE = 10000
+
+
+def create_account(user, categories, items):
+    with transaction.atomic():
+        seq = next_sequence(user.id)
+        Category.objects.bulk_create(
+            Category(user=user, name='bench %d' % n, seq=seq)
+            for n in range(categories)
+        )
+    category_ids = list(Category.objects.filter(user=user)
+                        .order_by('id').values_list('id', flat=True))
+
+    for start in range(0, items, BATCH_SIZE):
+        with transaction.atomic():
+            TodoItem.objects.bulk_create(
+                TodoItem(
+                    category_id=category_ids[n % len(category_ids)],
+                    name='item %d' % n, done=n % 3 == 0, seq=seq)
+                for n in range(start, min(start + BATCH_SIZE, items))
+            )
+
+    for category in Category.objects.filter(user=user).annotate(
+            items=Count('todoitem'),
+            done_items=Count('todoitem', filter=Q(todoitem__done=True))):
+        Category.objects.filter(id=category.id).update(
+            item_count=category.items, done_count=category.done_items)
+
+
+def delete_account(user):
+    # Plain queryset deletes, without loading the items into memory.
+    category_ids = list(Category.objects.filter(user=user)
+                        .values_list('id', flat=True))
+    for start in range(0, len(category_ids), 500):
+        TodoItem.objects.filter(
+            category_id__in=category_ids[start:start + 500]).delete()
+    user.delete()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the streaming export of a large account'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--items', type=int, default=1000000,
+            help='Items of the generated account')
+        parser.add_argument(
+            '--categories', type=int, default=100,
+            help='Categories the items are spread over')
+        parser.add_argument(
+            '--output', action='append', dest='outputs',
+            choices=sorted(ExportView.outputs),
+            help='Export output to measure (repeatable, default: all)')
+        parser.add_argument(
+            '--memory', action='store_true',
+            help='Trace the peak Python memory of the export (slower)')
+        parser.add_argument(
+            '--json', dest='json_output',
+            help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            username='bench-export-%d' % os.getpid())
+        try:
+            started = time.perf_counter()
+            create_account(user, options['categories'], options['items'])
+            self.stdout.write('generated %d items in %.1f s' % (
+                options['items'], time.perf_counter() - started))
+
+            results = []
+            for output in options['outputs'] or sorted(ExportView.outputs):
+                result = self.run(user, output, options['memory'])
+                results.append(result)
+                line = '%(output)-6s  %(seconds)7.2f s  ' \
+                    '%(items_per_second)10.0f items/s  %(megabytes)8.1f MB' \
+                    % result
+                if result['peak_memory_mb'] is not None:
+                    line += '  peak %(peak_memory_mb).1f MB' % result
+                self.stdout.write(line)
+        finally:
+            delete_account(user)
+
+        if options['json_output']:
+            with open(options['json_output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def run(self, user, output, memory):
+        request = APIRequestFactory().get('/', {'output': output})
+        force_authenticate(request, user=user)
+
+        if memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        response = ExportView.as_view()(request)
+        size = sum(len(chunk) for chunk in response.streaming_content)
+        elapsed = time.perf_counter() - started
+        peak = None
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+
+        items = TodoItem.objects.filter(category__user=user).count()
+        return {
+            'output': output,
+            'items': items,
+            'seconds': elapsed,
+            'items_per_second': items / elapsed if elapsed else 0,
+            'megabytes': size / 2 ** 20,
+            'peak_memory_mb': peak,
+        }
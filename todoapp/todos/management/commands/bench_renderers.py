@@ -0,0 +1,79 @@
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework import parsers, renderers, serializers
+
+from todoapp.renderers import JSONParser, JSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = 'Compare render and parse times of the JSON renderers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--items', type=int, action='append', dest='items',
+            help='Items of the rendered list (repeatable, default: 50, 500 '
+                 'and 10000)')
+        parser.add_argument(
+            '--rounds', type=int, default=20,
+            help='Rounds per renderer, the best one is reported')
+        parser.add_argument(
+            '--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        self.stdout.write('orjson %s' % (
+            orjson.__version__ if orjson is not None else 'not installed'))
+
+        results = []
+        for items in options['items'] or [50, 500, 10000]:
+            data = self.get_list(items)
+            body = renderers.JSONRenderer().render(data)
+            for name, renderer, parser in (
+                    ('drf', renderers.JSONRenderer(), parsers.JSONParser()),
+                    ('todoapp', JSONRenderer(), JSONParser())):
+                result = {
+                    'renderer': name,
+                    'items': items,
+                    'render_ms': 1000 * self.time(
+                        lambda: renderer.render(data), options['rounds']),
+                    'parse_ms': 1000 * self.time(
+                        lambda: parser.parse(io.BytesIO(body)),
+                        options['rounds']),
+                }
+                results.append(result)
+                self.stdout.write(
+                    '%(renderer)-8s %(items)6d items  render %(render_ms)8.3f'
+                    ' ms  parse %(parse_ms)8.3f ms' % result)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def get_list(self, items):
+        # An item list page as rendered by the item list view.
+        now = serializers.DateTimeField().to_representation(timezone.now())
+        return {
+            'next': 'http://testserver/api/todos/items/?cursor=abc',
+            'previous': None,
+            'results': [
+                {
+                    'id': n,
+                    'name': 'item %d' % n,
+                    'done': n % 3 == 0,
+                    'date_created': now,
+                    'category_id': n % 10,
+                }
+                for n in range(items)
+            ],
+        }
+
+    def time(self, function, rounds):
+        seconds = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            function()
+            seconds.append(time.perf_counter() - started)
+        return min(seconds)
@@ -0,0 +1,79 @@
+import json
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from todos.management.commands.bench_export import create_account, \
+    delete_account
+from todos.models import TodoItem
+from todos.serializers import TodoItemListSerializer, TodoItemSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare the item list serializers in items serialized per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--items', type=int, default=10000,
+            help='Items serialized per round')
+        parser.add_argument(
+            '--rounds', type=int, default=5,
+            help='Rounds per serializer, the best one is reported')
+        parser.add_argument(
+            '--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            username='bench-serializers-%d' % os.getpid())
+        try:
+            create_account(user, 1, options['items'])
+            queryset = TodoItem.objects.filter(category__user=user)\
+                .order_by('-date_created', '-id')
+            benchmarks = {
+                'model_serializer': (
+                    lambda: list(queryset.all()),
+                    lambda items: TodoItemSerializer(items, many=True).data,
+                ),
+                'list_serializer': (
+                    lambda: list(TodoItemListSerializer.get_rows(queryset)),
+                    lambda rows: TodoItemListSerializer(rows).data,
+                ),
+            }
+            results = [
+                self.run(name, load, serialize, options['rounds'])
+                for name, (load, serialize) in benchmarks.items()
+            ]
+        finally:
+            delete_account(user)
+
+        for result in results:
+            self.stdout.write(
+                '%(serializer)-16s  serialize %(serialize_per_second)10.0f '
+                'items/s  query+serialize %(total_per_second)10.0f items/s'
+                % result)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def run(self, name, load, serialize, rounds):
+        load_seconds, serialize_seconds = [], []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            rows = load()
+            loaded = time.perf_counter()
+            data = serialize(rows)
+            serialize_seconds.append(time.perf_counter() - loaded)
+            load_seconds.append(loaded - started)
+
+        serialize_time = min(serialize_seconds)
+        total_time = min(
+            load + serialize
+            for load, serialize in zip(load_seconds, serialize_seconds))
+        return {
+            'serializer': name,
+            'items': len(data),
+            'serialize_per_second': len(data) / serialize_time,
+            'total_per_second': len(data) / total_time,
+        }
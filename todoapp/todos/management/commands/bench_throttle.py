@@ -0,0 +1,68 @@
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import ScopedRateThrottle
+
+from todoapp.throttling import UserTokenBucketThrottle
+
+
+class Command(BaseCommand):
+    help = 'Measure the overhead of the throttle check per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--checks', type=int, default=20000,
+            help='Throttle checks per throttle')
+        parser.add_argument(
+            '--users', type=int, default=100,
+            help='Distinct users the checks are spread over')
+        parser.add_argument(
+            '--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        # A rate that is never exceeded, so every check takes a token.
+        rates = {'bench': '%d/s' % (10 * options['checks'])}
+        view = SimpleNamespace(throttle_scope='bench')
+        requests = []
+        for user_id in range(options['users']):
+            request = APIRequestFactory().get('/api/todos/items/')
+            request.user = SimpleNamespace(is_authenticated=True, pk=user_id)
+            requests.append(request)
+
+        results = []
+        for name, throttle_class, store in (
+                ('drf_scoped', ScopedRateThrottle, None),
+                ('bucket_local', UserTokenBucketThrottle, 'local'),
+                ('bucket_cache', UserTokenBucketThrottle, 'cache')):
+            with override_settings(THROTTLE_STORE=store or 'local'), \
+                    patch.dict(throttle_class.THROTTLE_RATES, rates):
+                result = self.run(
+                    name, throttle_class, requests, view, options['checks'])
+            results.append(result)
+            self.stdout.write(
+                '%(throttle)-13s %(us_per_check)8.2f us/check  '
+                '%(checks_per_second)10.0f checks/s' % result)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def run(self, name, throttle_class, requests, view, checks):
+        started = time.perf_counter()
+        for n in range(checks):
+            # A throttle instance per request, as DRF views create them.
+            if not throttle_class().allow_request(
+                    requests[n % len(requests)], view):
+                raise AssertionError('%s throttled a request' % name)
+        elapsed = time.perf_counter() - started
+        return {
+            'throttle': name,
+            'checks': checks,
+            'us_per_check': 1e6 * elapsed / checks,
+            'checks_per_second': checks / elapsed,
+        }
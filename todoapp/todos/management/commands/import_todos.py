@@ -0,0 +1,51 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from todos.importer import READERS, import_todos
+
+
+class Command(BaseCommand):
+    help = 'Import categories and items of a user from an NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument(
+            '--user', required=True,
+            help='Username of the account to import into')
+        parser.add_argument(
+            '--input', choices=sorted(READERS),
+            help='File format (default: from the file extension)')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get_by_natural_key(
+                options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError('User %s does not exist' % options['user'])
+
+        input_format = options['input'] or \
+            ('csv' if options['path'].endswith('.csv') else 'ndjson')
+        started = time.perf_counter()
+
+        def progress(totals):
+            elapsed = time.perf_counter() - started
+            self.stdout.write('%d items  %.1f items/s' % (
+                totals['items'], totals['items'] / elapsed))
+
+        try:
+            with open(options['path'], 'rb') as f:
+                totals = import_todos(user.id, f, input_format, progress)
+        except OSError as e:
+            raise CommandError(e)
+        except ValidationError as e:
+            raise CommandError(e.detail[0])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            'Imported %d items and %d new categories in %.1f s '
+            '(%.1f items/s)' % (
+                totals['items'], totals['categories'], elapsed,
+                totals['items'] / elapsed if elapsed else 0)))
@@ -0,0 +1,111 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+DEFAULT_PATHS = (
+    '/api/todos/categories/',
+    '/api/todos/async/categories/',
+)
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Load test API paths of a running server (e.g. WSGI vs ASGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', required=True,
+            help='Server to test, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--password', required=True)
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Path to request with GET (repeatable, default: the sync '
+                 'and async category lists)')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--warmup', type=int, default=50)
+        parser.add_argument('--timeout', type=float, default=10)
+        parser.add_argument(
+            '--label', default='',
+            help='Label stored with the results, e.g. wsgi or asgi')
+        parser.add_argument(
+            '--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        self.base_url = options['base_url'].rstrip('/')
+        self.timeout = options['timeout']
+        self.token = self.login(options['username'], options['password'])
+
+        results = []
+        for path in options['paths'] or DEFAULT_PATHS:
+            self.run(path, options['warmup'], options['concurrency'])
+            result = self.run(
+                path, options['requests'], options['concurrency'])
+            result['label'] = options['label']
+            results.append(result)
+            self.stdout.write(
+                '%(path)-40s %(rps)9.1f req/s  p50 %(p50_ms)7.2f ms  '
+                'p99 %(p99_ms)7.2f ms  errors %(errors)d' % result)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def login(self, username, password):
+        request = Request(
+            self.base_url + '/api/users/login/',
+            data=json.dumps(
+                {'username': username, 'password': password}).encode(),
+            headers={'Content-Type': 'application/json'},
+        )
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())['access']
+        except (HTTPError, URLError) as e:
+            raise CommandError('Login failed: %s' % e)
+
+    def request(self, path):
+        request = Request(
+            self.base_url + path,
+            headers={'Authorization': 'Bearer ' + self.token},
+        )
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                ok = 200 <= response.status < 300
+        except (HTTPError, URLError, OSError):
+            ok = False
+        return time.perf_counter() - started, ok
+
+    def run(self, path, requests, concurrency):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(executor.map(
+                lambda _: self.request(path), range(requests)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for latency, ok in samples if ok]
+        return {
+            'path': path,
+            'requests': requests,
+            'concurrency': concurrency,
+            'errors': len(samples) - len(latencies),
+            'rps': requests / elapsed if elapsed else 0,
+            'p50_ms': 1000 * (percentile(latencies, 0.50) or 0),
+            'p95_ms': 1000 * (percentile(latencies, 0.95) or 0),
+            'p99_ms': 1000 * (percentile(latencies, 0.99) or 0),
+        }
@@ -0,0 +1,60 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from todos.models import SyncSequence, Tombstone
+
+
+# Tombstones purged per batch. A user's share of a batch is purged in one
+# transaction holding their sequence row, so their own writes wait for at
+# most that many deletes.
+BATCH_SIZE = 1000
+
+
+def purge_batch(tombstones_by_user):
+    """Purge tombstones of users, one short transaction per user."""
+    for user_id, tombstones in sorted(tombstones_by_user.items()):
+        with transaction.atomic():
+            # Clients holding a token older than the purged tombstones
+            # can no longer sync incrementally and get a 410 instead.
+            seq = max(seq for _, seq in tombstones)
+            SyncSequence.objects.filter(
+                user_id=user_id, purged_through__lt=seq
+            ).update(purged_through=seq)
+            Tombstone.objects.filter(
+                id__in=[tombstone_id for tombstone_id, _ in tombstones]
+            ).delete()
+
+
+class Command(BaseCommand):
+    help = 'Purge sync tombstones older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=30,
+            help='Tombstones older than this many days are purged')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Tombstones purged per batch')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        expired = Tombstone.objects.filter(deleted_at__lt=cutoff)\
+            .order_by('deleted_at')
+
+        total = 0
+        while True:
+            tombstones_by_user = defaultdict(list)
+            for tombstone_id, user_id, seq in expired.values_list(
+                    'id', 'user_id', 'seq')[:options['batch_size']]:
+                tombstones_by_user[user_id].append((tombstone_id, seq))
+            if not tombstones_by_user:
+                break
+            purge_batch(tombstones_by_user)
+            total += sum(map(len, tombstones_by_user.values()))
+
+        self.stdout.write(
+            self.style.SUCCESS('Purged %d tombstones' % total))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from todos.cache import category_list_cache
+from todos.counters import get_actual_counts, get_miscounted_categories
+from todos.models import Category
+from todos.sync import next_sequence
+
+
+class Command(BaseCommand):
+    help = 'Recompute the item and done counters of categories'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='Only repair the categories of this user id (repeatable)')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report the miscounted categories without fixing them')
+
+    def handle(self, *args, **options):
+        categories = Category.objects.all()
+        if options['users']:
+            categories = categories.filter(user_id__in=options['users'])
+
+        miscounted = {}
+        for category_id, user_id in get_miscounted_categories(categories)\
+                .values_list('id', 'user_id'):
+            miscounted.setdefault(user_id, []).append(category_id)
+
+        if not options['dry_run']:
+            for user_id, category_ids in miscounted.items():
+                with transaction.atomic():
+                    Category.objects.filter(id__in=category_ids).update(
+                        updated_at=timezone.now(),
+                        seq=next_sequence(user_id),
+                        **get_actual_counts()
+                    )
+                category_list_cache.invalidate(user_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            '%s %d categories of %d users' % (
+                'Found' if options['dry_run'] else 'Repaired',
+                sum(len(ids) for ids in miscounted.values()),
+                len(miscounted))))
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.7 on 2026-10-17 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0002_remove_todoitem_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todoitem',
+            index=models.Index(fields=['category', '-date_created', '-id'], name='todos_item_cat_created_idx'),
+        ),
+    ]
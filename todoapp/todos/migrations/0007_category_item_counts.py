@@ -0,0 +1,40 @@
+# Generated by Django 3.1.7 on 2026-10-17 18:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_items(apps, schema_editor):
+    Category = apps.get_model('todos', 'Category')
+    TodoItem = apps.get_model('todos', 'TodoItem')
+    items = TodoItem.objects.filter(category=OuterRef('pk'))\
+        .order_by().values('category')
+    Category.objects.update(
+        item_count=Coalesce(Subquery(
+            items.annotate(count=Count('id')).values('count')), 0),
+        done_count=Coalesce(Subquery(
+            items.filter(done=True).annotate(count=Count('id'))
+            .values('count')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0006_category_user_name_item_done_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='done_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='item_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.1.7 on 2026-10-17 18:12
+
+from django.db import DatabaseError, migrations, models, transaction
+
+
+def create_trigram_index(apps, schema_editor):
+    # Name search (istartswith, which PostgreSQL runs as
+    # UPPER("name"::text) LIKE UPPER(%s)) can use a trigram index on the
+    # same expression; other databases search the category's range of the
+    # name index.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError:
+        # The extension is optional and may not be available to this role.
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS todos_item_name_trgm_idx '
+        'ON todos_todoitem USING gin (UPPER(name::text) gin_trgm_ops)')
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS todos_item_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0007_category_item_counts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todoitem',
+            index=models.Index(fields=['category', 'name', 'id'], name='todos_item_cat_name_idx'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
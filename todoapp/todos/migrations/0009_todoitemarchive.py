@@ -0,0 +1,38 @@
+# Generated by Django 3.1.7 on 2026-10-17 18:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0008_item_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoItemArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('done', models.BooleanField(default=True)),
+                ('date_created', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='todoitem',
+            index=models.Index(condition=models.Q(done=True), fields=['updated_at'], name='todos_item_done_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='todoitemarchive',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='todos.category'),
+        ),
+        migrations.AddIndex(
+            model_name='todoitemarchive',
+            index=models.Index(fields=['category', '-date_created', '-id'], name='todos_archive_cat_created_idx'),
+        ),
+    ]
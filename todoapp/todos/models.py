@@ -5,26 +5,149 @@ from django.contrib.auth import get_user_model
 
 class Category(models.Model):
     name = models.CharField(max_length=255)
+    # Covered by the (user, name) constraint and the (user, seq) index.
     user = models.ForeignKey(
         get_user_model(),
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    seq = models.BigIntegerField(default=0)
+    # Maintained with the item writes, see todos.counters.
+    item_count = models.IntegerField(default=0)
+    done_count = models.IntegerField(default=0)
 
     class Meta:
-        unique_together = ('name', 'user',)
+        constraints = [
+            # User first, so a user's categories are read in name order.
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='todos_category_user_name_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'seq'],
+                name='todos_category_user_seq_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
 class TodoItem(models.Model):
+    # Covered by the composite indexes starting with the category.
     category = models.ForeignKey(
         Category,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     name = models.CharField(max_length=255)
     done = models.BooleanField(default=False)
     date_created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    seq = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['category', '-date_created', '-id'],
+                name='todos_item_cat_created_idx',
+            ),
+            models.Index(
+                fields=['category', 'done', '-date_created', '-id'],
+                name='todos_item_cat_done_idx',
+            ),
+            models.Index(
+                fields=['category', 'name', 'id'],
+                name='todos_item_cat_name_idx',
+            ),
+            models.Index(
+                fields=['category', 'updated_at'],
+                name='todos_item_cat_updated_idx',
+            ),
+            models.Index(
+                fields=['category', 'seq'],
+                name='todos_item_cat_seq_idx',
+            ),
+            # Done items by age for archive_items, only as large as the
+            # done items not archived yet.
+            models.Index(
+                fields=['updated_at'],
+                condition=models.Q(done=True),
+                name='todos_item_done_updated_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class TodoItemArchive(models.Model):
+    """Done items moved out of TodoItem by archive_items."""
+    # The id the item had in TodoItem.
+    id = models.IntegerField(primary_key=True)
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    name = models.CharField(max_length=255)
+    done = models.BooleanField(default=True)
+    date_created = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['category', '-date_created', '-id'],
+                name='todos_archive_cat_created_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class SyncSequence(models.Model):
+    user = models.OneToOneField(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    value = models.BigIntegerField(default=0)
+    purged_through = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return '%s: %s' % (self.user_id, self.value)
+
+
+class Tombstone(models.Model):
+    CATEGORY = 'category'
+    ITEM = 'item'
+    KIND_CHOICES = (
+        (CATEGORY, 'Category'),
+        (ITEM, 'Todo item'),
+    )
+
+    user = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.CASCADE
+    )
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'seq'],
+                name='todos_tombstone_user_seq_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return '%s %s' % (self.kind, self.object_id)
@@ -0,0 +1,174 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+Cursor = namedtuple('Cursor', ['reverse', 'position'])
+
+
+def _reverse_ordering(ordering):
+    return tuple(
+        field[1:] if field.startswith('-') else '-' + field
+        for field in ordering
+    )
+
+
+def _get_value(row, name):
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, name)
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the full ordering tuple.
+
+    Unlike `CursorPagination`, which stores the first ordering value plus
+    an offset, the cursor holds the value of every ordering field of the
+    boundary row, so each page is a single indexed range scan no matter
+    how deep the client has paged.
+    """
+    ordering = ('-date_created', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request, view)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Paginate the rows of several querysets with the same ordering
+        fields as one list, like the items and the archived items: a page
+        of each is read and the pages merged.
+        """
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, querysets[0], view)
+        self.model = querysets[0].model
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = _reverse_ordering(self.ordering) if reverse \
+            else self.ordering
+
+        results = []
+        for queryset in querysets:
+            queryset = queryset.order_by(*ordering)
+            if self.cursor is not None:
+                queryset = queryset.filter(
+                    self.get_keyset_filter(ordering, self.cursor.position))
+            results += queryset[:self.page_size + 1]
+        if len(querysets) > 1:
+            # Sorted by each field from the last, as the sort is stable.
+            for field in reversed(ordering):
+                results.sort(
+                    key=lambda row: _get_value(row, field.lstrip('-')),
+                    reverse=field.startswith('-'))
+            del results[self.page_size + 1:]
+
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        # A unique trailing key is required for the keyset to be total.
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
+
+    def get_keyset_filter(self, ordering, position):
+        fields = [field.lstrip('-') for field in ordering]
+        lookups = ['lt' if field.startswith('-') else 'gt'
+                   for field in ordering]
+
+        condition = Q(**{'%s__%s' % (fields[-1], lookups[-1]): position[-1]})
+        for field, lookup, value in reversed(list(
+                zip(fields[:-1], lookups[:-1], position[:-1]))):
+            condition = Q(**{'%s__%s' % (field, lookup): value}) | \
+                (Q(**{field: value}) & condition)
+
+        # The inclusive bound on the leading field lets the database
+        # turn the whole predicate into an index range scan.
+        return Q(**{'%s__%se' % (fields[0], lookups[0]): position[0]}) & \
+            condition
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(
+            reverse=False,
+            position=self._get_position_from_instance(
+                self.page[-1], self.ordering)
+        ))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(
+            reverse=True,
+            position=self._get_position_from_instance(
+                self.page[0], self.ordering)
+        ))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            tokens = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            position = tokens['p']
+            if len(position) != len(self.ordering):
+                raise ValueError
+            position = [
+                self._get_field(field).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+            return Cursor(reverse=bool(tokens.get('r')), position=position)
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, cursor):
+        tokens = {'p': cursor.position}
+        if cursor.reverse:
+            tokens['r'] = 1
+        encoded = urlsafe_b64encode(
+            json.dumps(tokens, separators=(',', ':')).encode('ascii')
+        ).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def _get_field(self, field):
+        name = field.lstrip('-')
+        if name == 'pk':
+            return self.model._meta.pk
+        return self.model._meta.get_field(name)
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for field in ordering:
+            value = _get_value(instance, field.lstrip('-'))
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            position.append(value)
+        return position
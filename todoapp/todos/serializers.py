@@ -1,23 +1,249 @@
-from rest_framework import serializers
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers, status
+from rest_framework.settings import api_settings
 
+from todoapp.metrics import TimedListSerializer, TimedSerializerMixin
+from todos.counters import ItemCountChanges
 from todos.models import TodoItem, Category
+from todos.sync import delete_items, next_sequence
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin,
+                         serializers.ModelSerializer):
 
     class Meta:
         model = Category
-        fields = ('id', 'name', )
-        read_only_fields = ('id',)
+        list_serializer_class = TimedListSerializer
+        fields = ('id', 'name', 'item_count', 'done_count',)
+        read_only_fields = ('id', 'item_count', 'done_count',)
 
 
-class TodoItemSerializer(serializers.ModelSerializer):
+class TodoItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
-    category_id = serializers.IntegerField(
-        write_only=True,
-    )
+    category_id = serializers.IntegerField()
 
     class Meta:
         model = TodoItem
+        list_serializer_class = TimedListSerializer
         fields = ('id', 'name', 'done', 'date_created', 'category_id',)
         read_only_fields = ('id', 'date_created',)
+
+
+class TodoItemListSerializer(TimedSerializerMixin,
+                             serializers.BaseSerializer):
+    """
+    Read-only fast path of `TodoItemSerializer(many=True)` for lists.
+
+    Takes the named rows of `get_rows()` and builds the same dicts without
+    model instances or per-field serializer calls.
+    """
+    fields = ('id', 'name', 'done', 'date_created', 'category_id',)
+
+    @classmethod
+    def get_rows(cls, queryset):
+        return queryset.values_list(*cls.fields, named=True)
+
+    def to_representation(self, rows):
+        date_created = self.get_datetime_representation()
+        return [
+            {
+                'id': item_id,
+                'name': name,
+                'done': done,
+                'date_created': date_created(created),
+                'category_id': category_id,
+            }
+            for item_id, name, done, created, category_id in rows
+        ]
+
+    def get_datetime_representation(self):
+        field = serializers.DateTimeField()
+        if api_settings.DATETIME_FORMAT.lower() != ISO_8601 or \
+                not settings.USE_TZ:
+            return field.to_representation
+
+        # DateTimeField.to_representation() with the timezone looked up
+        # once per list instead of once per value.
+        current_timezone = field.default_timezone()
+
+        def to_representation(value):
+            value = value.astimezone(current_timezone).isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return to_representation
+
+
+class TodoItemBulkOperationSerializer(serializers.Serializer):
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+    op = serializers.ChoiceField(choices=(CREATE, UPDATE, DELETE))
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        op = attrs['op']
+        if op != self.CREATE and 'id' not in attrs:
+            raise serializers.ValidationError(
+                {'id': 'This field is required.'})
+        if op == self.DELETE:
+            attrs.pop('data', None)
+            return attrs
+        if 'data' not in attrs:
+            raise serializers.ValidationError(
+                {'data': 'This field is required.'})
+
+        item_serializer = TodoItemSerializer(
+            data=attrs['data'], partial=op == self.UPDATE)
+        if not item_serializer.is_valid():
+            raise serializers.ValidationError(
+                {'data': item_serializer.errors})
+        attrs['data'] = item_serializer.validated_data
+        return attrs
+
+
+class TodoItemBulkSerializer(serializers.Serializer):
+    MAX_OPERATIONS = 500
+
+    operations = TodoItemBulkOperationSerializer(many=True)
+
+    def validate_operations(self, operations):
+        if not operations:
+            raise serializers.ValidationError('No operations given')
+        if len(operations) > self.MAX_OPERATIONS:
+            raise serializers.ValidationError(
+                'At most %d operations are allowed' % self.MAX_OPERATIONS)
+        return operations
+
+    def validate(self, attrs):
+        operations = attrs['operations']
+        user = self.context['request'].user
+
+        category_ids = {
+            operation['data']['category_id'] for operation in operations
+            if 'category_id' in operation.get('data', {})
+        }
+        item_ids = [
+            operation['id'] for operation in operations
+            if operation['op'] != TodoItemBulkOperationSerializer.CREATE
+        ]
+
+        owned_category_ids = set(Category.objects.filter(
+            user_id=user.id, id__in=category_ids).values_list('id', flat=True))
+        self.items = TodoItem.objects.filter(
+            category__user_id=user.id).in_bulk(item_ids)
+
+        errors = []
+        seen_item_ids = set()
+        for operation in operations:
+            error = {}
+            category_id = operation.get('data', {}).get('category_id')
+            if category_id is not None and \
+                    category_id not in owned_category_ids:
+                error['data'] = {'category_id': 'Invalid category'}
+            if 'id' in operation:
+                if operation['id'] not in self.items:
+                    error['id'] = 'Invalid item pk'
+                elif operation['id'] in seen_item_ids:
+                    error['id'] = 'Item is already used in this batch'
+                seen_item_ids.add(operation['id'])
+            errors.append(error)
+
+        if any(errors):
+            raise serializers.ValidationError({'operations': errors})
+        return attrs
+
+    def create(self, validated_data):
+        operations = validated_data['operations']
+        user_id = self.context['request'].user.id
+        created, updated, update_fields, deleted = [], [], set(), []
+        results = []
+        counts = ItemCountChanges()
+        now = timezone.now()
+
+        with transaction.atomic():
+            # The whole batch shares one change sequence number.
+            seq = next_sequence(user_id)
+            stored = self._get_stored_counts(operations)
+
+            for operation in operations:
+                if operation['op'] == TodoItemBulkOperationSerializer.CREATE:
+                    item = TodoItem(**operation['data'], seq=seq)
+                    counts.add(item.category_id, item.done)
+                    created.append(item)
+                elif operation['op'] == \
+                        TodoItemBulkOperationSerializer.UPDATE:
+                    item = self.items[operation['id']]
+                    if item.id in stored:
+                        item.category_id, item.done = stored[item.id]
+                        counts.remove(item.category_id, item.done)
+                    for field, value in operation['data'].items():
+                        setattr(item, field, value)
+                    if item.id in stored:
+                        counts.add(item.category_id, item.done)
+                    # bulk_update() skips auto_now, so stamp it here.
+                    item.updated_at = now
+                    item.seq = seq
+                    update_fields.update(operation['data'], ['updated_at'])
+                    updated.append(item)
+                else:
+                    item = None
+                    deleted.append(self.items[operation['id']])
+                results.append((operation, item))
+
+            self._bulk_create(created)
+            if updated:
+                TodoItem.objects.bulk_update(
+                    updated, update_fields | {'seq'})
+            if deleted:
+                delete_items(user_id, deleted, seq, counts)
+            counts.apply(user_id, seq)
+
+        return [
+            self._get_result(operation, item) for operation, item in results
+        ]
+
+    def _get_stored_counts(self, operations):
+        # The category and done state of the updated items as stored, read
+        # under the lock of the sequence: the items loaded by validate()
+        # may be stale. Items deleted meanwhile are not counted.
+        item_ids = [
+            operation['id'] for operation in operations
+            if operation['op'] == TodoItemBulkOperationSerializer.UPDATE
+        ]
+        if not item_ids:
+            return {}
+        return {
+            item_id: (category_id, done)
+            for item_id, category_id, done in TodoItem.objects.filter(
+                id__in=item_ids).values_list('id', 'category_id', 'done')
+        }
+
+    def _bulk_create(self, items):
+        connection = connections[router.db_for_write(TodoItem)]
+        if connection.features.can_return_rows_from_bulk_insert:
+            TodoItem.objects.bulk_create(items)
+        else:
+            # The primary keys of the new rows are needed for the response.
+            for item in items:
+                item.save(force_insert=True)
+
+    def _get_result(self, operation, item):
+        if operation['op'] == TodoItemBulkOperationSerializer.DELETE:
+            return {
+                'op': operation['op'],
+                'id': operation['id'],
+                'status': status.HTTP_204_NO_CONTENT,
+            }
+        return {
+            'op': operation['op'],
+            'id': item.id,
+            'status': status.HTTP_201_CREATED
+            if operation['op'] == TodoItemBulkOperationSerializer.CREATE
+            else status.HTTP_200_OK,
+            'item': TodoItemSerializer(item).data,
+        }
@@ -0,0 +1,85 @@
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.http import Http404
+from rest_framework.exceptions import ValidationError
+
+from todos.conditional import get_list_validators
+from todos.counters import ItemCountChanges
+from todos.models import Category, TodoItem
+from todos.serializers import CategorySerializer
+from todos.sync import next_sequence
+
+
+def get_category_list_entry(user_id):
+    # The entry is shared by all clients of the user, so it is read from
+    # the primary: one filled from a lagging replica would hide a client's
+    # own writes even from its sticky requests.
+    categories = list(Category.objects.using(DEFAULT_DB_ALIAS)
+                      .filter(user_id=user_id).order_by('name'))
+    etag, last_modified = get_list_validators(
+        len(categories),
+        max((c.updated_at for c in categories), default=None)
+    )
+    return {
+        'data': list(CategorySerializer(categories, many=True).data),
+        'etag': etag,
+        'last_modified': last_modified,
+    }
+
+
+def save_category(serializer, user_id):
+    # The (user, name) constraint rejects duplicates, also between
+    # concurrent requests that a SELECT beforehand would let through.
+    try:
+        with transaction.atomic():
+            return serializer.save(
+                user_id=user_id, seq=next_sequence(user_id))
+    except IntegrityError:
+        raise ValidationError('Category name is already existed')
+
+
+def check_category(user_id, category_id, message='Invalid category'):
+    if not Category.objects.filter(id=category_id, user_id=user_id).exists():
+        raise ValidationError(message)
+
+
+def get_items_version(user_id, category_ids):
+    """
+    The version of the item lists of categories, with their last change.
+
+    Every item write stamps the sequence number and time on its category,
+    so the version is read from the category rows without scanning their
+    items. Foreign categories are left out, like their items; none of the
+    categories being the user's is an error. `category_ids` None selects
+    all categories of the user.
+    """
+    queryset = Category.objects.filter(user_id=user_id)
+    if category_ids is not None:
+        queryset = queryset.filter(id__in=category_ids)
+    versions = sorted(queryset.values_list('id', 'seq', 'updated_at'))
+    if category_ids and not versions:
+        raise ValidationError('Invalid category id')
+    return versions, max(
+        (updated_at for _, _, updated_at in versions), default=None)
+
+
+def save_item(serializer, user_id):
+    if 'category_id' in serializer.validated_data:
+        check_category(user_id, serializer.validated_data['category_id'])
+
+    counts = ItemCountChanges()
+    with transaction.atomic():
+        seq = next_sequence(user_id)
+        instance = serializer.instance
+        if instance is not None:
+            # Counted as stored, read again under the lock of the sequence:
+            # the instance was loaded before it and may be stale.
+            stored = TodoItem.objects.filter(id=instance.id)\
+                .values_list('category_id', 'done').first()
+            if stored is None:
+                raise Http404
+            instance.category_id, instance.done = stored
+            counts.remove(instance.category_id, instance.done)
+        item = serializer.save(seq=seq)
+        counts.add(item.category_id, item.done)
+        counts.apply(user_id, seq)
+    return item
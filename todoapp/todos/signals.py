@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from todos.cache import category_list_cache
+from todos.models import Category, SyncSequence
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_list(sender, instance, **kwargs):
+    category_list_cache.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def create_sync_sequence(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        SyncSequence.objects.create(user=instance)
@@ -0,0 +1,102 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from todos.counters import ItemCountChanges
+from todos.models import Category, SyncSequence, TodoItem, Tombstone
+
+
+def next_sequence(user_id):
+    """
+    Reserve the next change sequence number of a user.
+
+    Must be called inside the transaction that writes the change: the
+    counter row stays locked until commit, so the user's changes become
+    visible in sequence order and a sync token never skips one.
+    """
+    assert transaction.get_connection().in_atomic_block, \
+        'next_sequence() must be called inside a transaction'
+
+    sequences = SyncSequence.objects.filter(user_id=user_id)
+    if not sequences.update(value=F('value') + 1):
+        try:
+            with transaction.atomic():
+                SyncSequence.objects.create(user_id=user_id, value=1)
+            return 1
+        except IntegrityError:
+            sequences.update(value=F('value') + 1)
+    return sequences.values_list('value', flat=True).get()
+
+
+def get_sequence(user_id):
+    return SyncSequence.objects.filter(user_id=user_id)\
+        .values_list('value', 'purged_through').first() or (0, 0)
+
+
+def delete_category(category):
+    with transaction.atomic():
+        seq = next_sequence(category.user_id)
+        item_ids = list(TodoItem.objects.filter(
+            category=category).values_list('id', flat=True))
+        Tombstone.objects.bulk_create(
+            [Tombstone(user_id=category.user_id, kind=Tombstone.CATEGORY,
+                       object_id=category.id, seq=seq)] +
+            _item_tombstones(category.user_id, item_ids, seq)
+        )
+        category.delete()
+
+
+def delete_items(user_id, items, seq=None, counts=None):
+    """
+    Delete items of a user, leaving tombstones for sync.
+
+    The items are read again under the lock of the user's sequence, and
+    only those still there are deleted and counted: `items` may have been
+    loaded before a concurrent write. The category counters are updated
+    too, unless `counts` is given: the changes are then added to it for
+    the caller to apply.
+    """
+    with transaction.atomic():
+        if seq is None:
+            seq = next_sequence(user_id)
+        items = list(TodoItem.objects.filter(
+            id__in=[item.id for item in items])
+            .values_list('id', 'category_id', 'done', named=True))
+        item_ids = [item.id for item in items]
+        Tombstone.objects.bulk_create(
+            _item_tombstones(user_id, item_ids, seq))
+        TodoItem.objects.filter(id__in=item_ids).delete()
+
+        apply_counts = counts is None
+        if apply_counts:
+            counts = ItemCountChanges()
+        for item in items:
+            counts.remove(item.category_id, item.done)
+        if apply_counts:
+            counts.apply(user_id, seq)
+
+
+def get_changes(user_id, since):
+    categories = Category.objects.filter(user_id=user_id)
+    items = TodoItem.objects.filter(category__user_id=user_id)
+    changes = {'deleted': {Tombstone.CATEGORY: [], Tombstone.ITEM: []}}
+    # A full sync (since=0) returns all the live rows, also those left at
+    # seq 0 by writes outside the API and from before sync existed, and
+    # needs no tombstones.
+    if since:
+        categories = categories.filter(seq__gt=since)
+        items = items.filter(seq__gt=since)
+        for kind, object_id in Tombstone.objects.filter(
+                user_id=user_id, seq__gt=since)\
+                .order_by('seq').values_list('kind', 'object_id'):
+            changes['deleted'][kind].append(object_id)
+    changes['categories'] = categories.order_by('seq')
+    changes['items'] = items.order_by('seq')
+    return changes
+
+
+def _item_tombstones(user_id, item_ids, seq):
+    return [
+        Tombstone(user_id=user_id, kind=Tombstone.ITEM,
+                  object_id=item_id, seq=seq)
+        for item_id in item_ids
+    ]
@@ -1,16 +1,56 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.http import JsonResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
-from todos.models import Category, TodoItem
-from todos.serializers import CategorySerializer, TodoItemSerializer
+from todoapp.handlers import iterate_streaming_content
+from todoapp.querybudget import query_budget
+from todoapp.routers import ReplicaRouter
+from todos.archive import archive_batch
+from todos.async_views import AsyncCategoryListView
+from todos.cache import category_list_cache
+from todos.counters import get_miscounted_categories
+from todos.models import Category, SyncSequence, TodoItem, \
+    TodoItemArchive, Tombstone
+from todos.pagination import KeysetPagination
+from todos.serializers import CategorySerializer, TodoItemBulkSerializer, \
+    TodoItemListSerializer, TodoItemSerializer
+from todos.services import get_category_list_entry
+from todos.sync import delete_items
+from todos.views import CategoryViewSet, TodoItemViewSet
+from user.authentication import is_user_active
+from user.serializers import LoginSerializer
 
 
 CATEGORY_LIST_URL = reverse('todo:category-list')
 TODO_ITEM_LIST_URL = reverse('todo:todoitem-list')
+TODO_ITEM_BULK_URL = reverse('todo:todoitem-bulk')
+SYNC_URL = reverse('todo:sync')
+EXPORT_URL = reverse('todo:export')
+IMPORT_URL = reverse('todo:import')
+ASYNC_CATEGORY_LIST_URL = reverse('todo:async-category-list')
+ASYNC_TODO_ITEM_LIST_URL = reverse('todo:async-todoitem-list')
 
 
 def get_todo_item_detail_url(item_id):
@@ -132,6 +172,15 @@ class PrivateCategoryApiTest(TestCase):
         res = self.client.post(CATEGORY_LIST_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data, ['Category name is already existed'])
+
+    def test_create_category_no_pre_check(self):
+        """Test that a category is created without a duplicate check query"""
+        # savepoint, sequence update and read, insert, release
+        with self.assertNumQueries(5):
+            res = self.client.post(CATEGORY_LIST_URL, {'name': 'cat_name'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
 
     def test_update_category(self):
         """Test updating a category by an authenticated user"""
@@ -174,6 +223,7 @@ class PrivateCategoryApiTest(TestCase):
 
         category.refresh_from_db()
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data, ['Category name is already existed'])
         self.assertNotEqual(category.name, payload['name'])
 
     def test_deleting_category(self):
@@ -199,6 +249,416 @@ class PrivateCategoryApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
 
 
+class ConcurrentCategoryApiTest(TransactionTestCase):
+    """Test category writes from concurrent clients"""
+
+    def test_duplicate_created_before_save(self):
+        """Test a duplicate committed after validation is rejected"""
+        user = create_user(username='username', password='password')
+        client = APIClient()
+        client.force_authenticate(user=user)
+        perform_create = CategoryViewSet.perform_create
+
+        def perform_create_after_other(view, serializer):
+            # The other request commits between validation and save().
+            create_sample_cateory(user, 'cat_name')
+            perform_create(view, serializer)
+
+        with patch.object(CategoryViewSet, 'perform_create',
+                          perform_create_after_other):
+            res = client.post(CATEGORY_LIST_URL, {'name': 'cat_name'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            Category.objects.filter(user=user, name='cat_name').count(), 1)
+
+    def test_concurrent_create_same_name(self):
+        """Test that only one of concurrent duplicate creates succeeds"""
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('In-memory SQLite fails on locked tables, set '
+                          'DJANGO_TEST_DB_NAME to a file')
+        user = create_user(username='username', password='password')
+        clients = 4
+        barrier = threading.Barrier(clients)
+        statuses = []
+
+        def create():
+            client = APIClient()
+            client.force_authenticate(user=user)
+            try:
+                barrier.wait()
+                res = client.post(CATEGORY_LIST_URL, {'name': 'cat_name'})
+                statuses.append(res.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=create) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [status.HTTP_201_CREATED] + [
+            status.HTTP_400_BAD_REQUEST] * (clients - 1))
+        self.assertEqual(
+            Category.objects.filter(user=user, name='cat_name').count(), 1)
+
+
+class CategoryCounterTest(TestCase):
+    """Test the item counters of categories"""
+
+    def setUp(self):
+        self.user = create_user(username='username', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.category = create_sample_cateory(self.user, 'cat1')
+
+    def create_item(self, name, category=None):
+        return self.client.post(TODO_ITEM_LIST_URL, {
+            'name': name,
+            'category_id': (category or self.category).id,
+        }).data['id']
+
+    def assertCounts(self, category, item_count, done_count):
+        category.refresh_from_db()
+        self.assertEqual(
+            (category.item_count, category.done_count),
+            (item_count, done_count))
+
+    def test_item_writes_update_counts(self):
+        """Test creating, finishing, moving and deleting items"""
+        category2 = create_sample_cateory(self.user, 'cat2')
+        item1_id = self.create_item('item1')
+        item2_id = self.create_item('item2')
+        self.assertCounts(self.category, 2, 0)
+
+        self.client.patch(get_todo_item_detail_url(item1_id), {'done': True})
+        self.assertCounts(self.category, 2, 1)
+
+        self.client.patch(get_todo_item_detail_url(item1_id),
+                          {'category_id': category2.id})
+        self.assertCounts(self.category, 1, 0)
+        self.assertCounts(category2, 1, 1)
+
+        self.client.delete(get_todo_item_detail_url(item2_id))
+        self.assertCounts(self.category, 0, 0)
+
+    def test_rename_keeps_counts(self):
+        """Test that a rename keeps the counts and stamps the category"""
+        item_id = self.create_item('item')
+        seq = Category.objects.get(id=self.category.id).seq
+
+        # item, savepoint, sequence update and read, item again, update,
+        # category stamp, release
+        with self.assertNumQueries(8):
+            self.client.patch(
+                get_todo_item_detail_url(item_id), {'name': 'renamed'})
+
+        self.assertCounts(self.category, 1, 0)
+        self.assertGreater(self.category.seq, seq)
+
+    def finish_concurrently(self, item_id):
+        # A write committed between the request loading the item and
+        # taking the lock of the user's sequence.
+        TodoItem.objects.filter(id=item_id).update(done=True)
+        Category.objects.filter(id=self.category.id).update(
+            done_count=F('done_count') + 1)
+
+    def test_update_counts_stored_item(self):
+        """Test an update counts the item as stored, not as loaded"""
+        item_id = self.create_item('item')
+        get_object = TodoItemViewSet.get_object
+
+        def get_stale_object(view):
+            item = get_object(view)
+            self.finish_concurrently(item.id)
+            return item
+
+        with patch.object(TodoItemViewSet, 'get_object', get_stale_object):
+            res = self.client.patch(
+                get_todo_item_detail_url(item_id), {'name': 'renamed'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data['done'])
+        self.assertCounts(self.category, 1, 1)
+
+    def test_delete_counts_deleted_rows(self):
+        """Test deleting an item deleted meanwhile leaves the counts"""
+        item_id = self.create_item('item')
+        get_object = TodoItemViewSet.get_object
+
+        def get_stale_object(view):
+            item = get_object(view)
+            delete_items(self.user.id, [item])
+            return item
+
+        with patch.object(TodoItemViewSet, 'get_object', get_stale_object):
+            self.client.delete(get_todo_item_detail_url(item_id))
+
+        self.assertCounts(self.category, 0, 0)
+        self.assertEqual(Tombstone.objects.count(), 1)
+
+    def test_bulk_counts_stored_items(self):
+        """Test a bulk batch counts its items as stored, not as loaded"""
+        item1_id = self.create_item('item1')
+        item2_id = self.create_item('item2')
+        validate = TodoItemBulkSerializer.validate
+
+        def validate_stale(serializer, attrs):
+            attrs = validate(serializer, attrs)
+            self.finish_concurrently(item1_id)
+            self.finish_concurrently(item2_id)
+            return attrs
+
+        with patch.object(TodoItemBulkSerializer, 'validate',
+                          validate_stale):
+            self.client.post(TODO_ITEM_BULK_URL, {'operations': [
+                {'op': 'update', 'id': item1_id, 'data': {'name': 'new'}},
+                {'op': 'delete', 'id': item2_id},
+            ]}, format='json')
+
+        self.assertCounts(self.category, 1, 1)
+        self.assertFalse(get_miscounted_categories().exists())
+
+    def test_bulk_operations_update_counts(self):
+        """Test that a bulk batch updates the counts of its categories"""
+        category2 = create_sample_cateory(self.user, 'cat2')
+        item1_id = self.create_item('item1')
+        item2_id = self.create_item('item2')
+
+        self.client.post(TODO_ITEM_BULK_URL, {'operations': [
+            {'op': 'create', 'data': {
+                'name': 'new', 'done': True, 'category_id': category2.id}},
+            {'op': 'update', 'id': item1_id,
+             'data': {'done': True, 'category_id': category2.id}},
+            {'op': 'delete', 'id': item2_id},
+        ]}, format='json')
+
+        self.assertCounts(self.category, 0, 0)
+        self.assertCounts(category2, 2, 2)
+
+    def test_category_list_counts(self):
+        """Test that the cached category list returns fresh counts"""
+        self.client.get(CATEGORY_LIST_URL)
+        item_id = self.create_item('item')
+        self.client.patch(get_todo_item_detail_url(item_id), {'done': True})
+
+        res = self.client.get(CATEGORY_LIST_URL)
+
+        self.assertEqual(res.data, [{
+            'id': self.category.id, 'name': 'cat1',
+            'item_count': 1, 'done_count': 1,
+        }])
+
+    def test_recount_items(self):
+        """Test that the repair command recomputes drifted counters"""
+        create_sample_item(self.category, 'item1')
+        TodoItem.objects.create(
+            category=self.category, name='item2', done=True)
+        empty = create_sample_cateory(self.user, 'cat2')
+        Category.objects.filter(id=empty.id).update(
+            item_count=3, done_count=1)
+        cached = self.client.get(CATEGORY_LIST_URL)
+
+        out = StringIO()
+        call_command('recount_items', '--dry-run', stdout=out)
+        self.assertIn('Found 2 categories of 1 users', out.getvalue())
+        self.assertCounts(self.category, 0, 0)
+
+        call_command('recount_items', stdout=StringIO())
+        self.assertCounts(self.category, 2, 1)
+        self.assertCounts(empty, 0, 0)
+        res = self.client.get(
+            CATEGORY_LIST_URL, HTTP_IF_NONE_MATCH=cached['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class CategoryListCacheCommitTest(TransactionTestCase):
+    """Test the category list cache around the commit of writes"""
+
+    def setUp(self):
+        self.user = create_user(username='username', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        category_list_cache.cache.clear()
+
+    def test_cache_filled_before_commit(self):
+        """Test a list cached before a write commits is not served"""
+        category = create_sample_cateory(self.user, 'cat1')
+        committed = get_category_list_entry(self.user.id)
+
+        with transaction.atomic():
+            self.client.patch(
+                get_category_detail_url(category.id), {'name': 'renamed'})
+            # A concurrent request missing the entry caches the list as
+            # committed so far.
+            category_list_cache.get_or_set(self.user.id, lambda: committed)
+
+        res = self.client.get(CATEGORY_LIST_URL)
+        self.assertEqual([c['name'] for c in res.data], ['renamed'])
+
+
+class CategoryListCacheTest(TestCase):
+    """Test the per-user category list cache"""
+
+    def setUp(self):
+        self.user = create_user(username='username', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        category_list_cache.cache.clear()
+        category_list_cache.reset_stats()
+
+    def test_category_list_cached(self):
+        """Test that a repeated category list is served from the cache"""
+        create_sample_cateory(self.user, 'cat1')
+
+        res1 = self.client.get(CATEGORY_LIST_URL)
+        with self.assertNumQueries(0):
+            res2 = self.client.get(CATEGORY_LIST_URL)
+
+        self.assertEqual(res1.data, res2.data)
+        self.assertEqual(
+            category_list_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_cache_is_per_user(self):
+        """Test that users do not share cached category lists"""
+        create_sample_cateory(self.user, 'cat1')
+        self.client.get(CATEGORY_LIST_URL)
+
+        client = APIClient()
+        client.force_authenticate(user=create_user('username2', 'password'))
+        res = client.get(CATEGORY_LIST_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_cache_invalidated_on_writes(self):
+        """Test that creating, updating and deleting refresh the list"""
+        self.client.get(CATEGORY_LIST_URL)
+
+        res = self.client.post(CATEGORY_LIST_URL, {'name': 'cat1'})
+        category_id = res.data['id']
+        res = self.client.get(CATEGORY_LIST_URL)
+        self.assertEqual([c['name'] for c in res.data], ['cat1'])
+
+        self.client.patch(
+            get_category_detail_url(category_id), {'name': 'cat2'})
+        res = self.client.get(CATEGORY_LIST_URL)
+        self.assertEqual([c['name'] for c in res.data], ['cat2'])
+
+        self.client.delete(get_category_detail_url(category_id))
+        res = self.client.get(CATEGORY_LIST_URL)
+        self.assertEqual(res.data, [])
+        self.assertEqual(category_list_cache.stats()['hits'], 0)
+
+    def test_cache_invalidated_on_cascade_delete(self):
+        """Test that deleting the user drops the cached list"""
+        create_sample_cateory(self.user, 'cat1')
+        self.client.get(CATEGORY_LIST_URL)
+        key = category_list_cache.get_key(self.user.id)
+        self.assertIsNotNone(category_list_cache.cache.get(key))
+
+        self.user.delete()
+
+        self.assertIsNone(category_list_cache.cache.get(key))
+
+    def test_cache_filled_from_primary(self):
+        """Test the shared list is not filled from a lagging replica"""
+        create_sample_cateory(self.user, 'cat1')
+
+        # Any read routed to the unconfigured replica would fail.
+        with patch.object(ReplicaRouter, 'db_for_read',
+                          return_value='replica1'):
+            res = self.client.get(CATEGORY_LIST_URL)
+
+        self.assertEqual([c['name'] for c in res.data], ['cat1'])
+
+
+class ConditionalListApiTest(TestCase):
+    """Test ETag and Last-Modified handling of the list endpoints"""
+
+    def setUp(self):
+        self.user = create_user(username='username', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.category = create_sample_cateory(self.user, 'cat1')
+        category_list_cache.cache.clear()
+
+    def test_category_list_not_modified(self):
+        """Test that an unchanged category list returns 304"""
+        res = self.client.get(CATEGORY_LIST_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', res)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(
+                CATEGORY_LIST_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_category_list_modified(self):
+        """Test that a changed category list returns a new ETag"""
+        etag = self.client.get(CATEGORY_LIST_URL)['ETag']
+
+        self.category.name = 'cat2'
+        self.category.save()
+        res = self.client.get(CATEGORY_LIST_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_item_list_not_modified(self):
+        """Test that an unchanged item list returns 304 from its category"""
+        create_sample_item(self.category, 'item1')
+        params = {'category_id': self.category.id}
+        res = self.client.get(TODO_ITEM_LIST_URL, params)
+        self.assertIn('Last-Modified', res)
+
+        with self.assertNumQueries(1), \
+                CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                TODO_ITEM_LIST_URL, params, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotIn('todos_todoitem', queries[0]['sql'])
+
+    def test_item_list_modified(self):
+        """Test that item updates, renames and deletions change the ETag"""
+        item1 = create_sample_item(self.category, 'item1')
+        item2 = create_sample_item(self.category, 'item2')
+        params = {'category_id': self.category.id}
+        etag = self.client.get(TODO_ITEM_LIST_URL, params)['ETag']
+
+        self.client.delete(get_todo_item_detail_url(item1.id))
+        res = self.client.get(
+            TODO_ITEM_LIST_URL, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        etag = res['ETag']
+
+        self.client.patch(get_todo_item_detail_url(item2.id), {'done': True})
+        res = self.client.get(
+            TODO_ITEM_LIST_URL, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        etag = res['ETag']
+
+        self.client.patch(
+            get_todo_item_detail_url(item2.id), {'name': 'renamed'})
+        res = self.client.get(
+            TODO_ITEM_LIST_URL, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_item_list_etag_per_page(self):
+        """Test that different pages of the same list differ in ETag"""
+        create_sample_item(self.category, 'item1')
+        create_sample_item(self.category, 'item2')
+
+        res1 = self.client.get(
+            TODO_ITEM_LIST_URL,
+            {'category_id': self.category.id, 'page_size': 1})
+        res2 = self.client.get(res1.data['next'])
+
+        self.assertNotEqual(res1['ETag'], res2['ETag'])
+
+
 class PublicTodoItemApiTest(TestCase):
     """Test API requests that do not require authentication"""
 
@@ -272,7 +732,112 @@ class PrivateTodoItemApiTest(TestCase):
         serializer = TodoItemSerializer(items, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_get_todo_items_paginated(self):
+        """Test paging through the todo items with cursors"""
+        category = create_sample_cateory(self.user, name='cat_name1')
+        for i in range(5):
+            create_sample_item(category, 'name%d' % i)
+
+        res = self.client.get(
+            TODO_ITEM_LIST_URL, {'category_id': category.id, 'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data['previous'])
+
+        names = [item['name'] for item in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            names.extend(item['name'] for item in res.data['results'])
+
+        self.assertEqual(names, ['name4', 'name3', 'name2', 'name1', 'name0'])
+
+        res = self.client.get(res.data['previous'])
+        self.assertEqual(
+            [item['name'] for item in res.data['results']],
+            ['name2', 'name1']
+        )
+
+    def test_get_todo_items_page_size_capped(self):
+        """Test that the requested page size is capped by the server"""
+        category = create_sample_cateory(self.user, name='cat_name1')
+        for i in range(3):
+            create_sample_item(category, 'name%d' % i)
+
+        with patch.object(KeysetPagination, 'max_page_size', 2):
+            res = self.client.get(
+                TODO_ITEM_LIST_URL,
+                {'category_id': category.id, 'page_size': 100}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
+    def test_get_todo_items_invalid_cursor(self):
+        """Test getting todo items with a malformed cursor"""
+        category = create_sample_cateory(self.user, name='cat_name1')
+
+        res = self.client.get(
+            TODO_ITEM_LIST_URL, {'category_id': category.id, 'cursor': 'xx'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_todo_items_invalid_category_id(self):
+        """Test getting todo items of a missing or foreign category"""
+        other_category = create_sample_cateory(
+            create_user('username2', 'password'), 'cat_name1')
+        create_sample_item(other_category, 'name1')
+
+        for params in ({}, {'category_id': 'abc'}, {'category_id': 999},
+                       {'category_id': other_category.id}):
+            res = self.client.get(TODO_ITEM_LIST_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_todo_items_query_budget(self):
+        """Test that listing items checks ownership in the item query"""
+        category = create_sample_cateory(self.user, name='cat_name1')
+        create_sample_item(category, 'name1')
+
+        # list version for the ETag, then the page itself
+        with self.assertNumQueries(2):
+            res = self.client.get(
+                TODO_ITEM_LIST_URL, {'category_id': category.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_create_todo_item_query_budget(self):
+        """Test the queries of creating an item, counters included"""
+        category = create_sample_cateory(self.user, name='cat_name1')
+
+        # ownership, then savepoint, sequence update and read, insert,
+        # counter update and savepoint release
+        with self.assertNumQueries(7):
+            res = self.client.post(TODO_ITEM_LIST_URL, {
+                'name': 'item', 'category_id': category.id})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_update_todo_item_query_budget(self):
+        """Test the queries of moving an item, counters included"""
+        item = create_sample_item(
+            create_sample_cateory(self.user, 'cat1'), 'item')
+        category = create_sample_cateory(self.user, 'cat2')
+
+        # item, ownership, then savepoint, sequence update and read, item
+        # again, update, counter update of both categories and savepoint
+        # release
+        with self.assertNumQueries(10):
+            res = self.client.patch(
+                get_todo_item_detail_url(item.id),
+                {'category_id': category.id}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
 
     def test_create_todo_item(self):
         """Test creating an item by an authenticated user"""
@@ -419,6 +984,18 @@ class PrivateTodoItemApiTest(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_update_other_users_todo_item(self):
+        """Test that an item of another user cannot be updated"""
+        item = create_sample_item(create_sample_cateory(
+            create_user('username2', 'password'), 'cat1'), 'item')
+
+        res = self.client.patch(
+            get_todo_item_detail_url(item.id), {'name': 'new_name'})
+
+        item.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(item.name, 'item')
+
     def test_destroy_todo_item(self):
         """Test deleting an item"""
         item = create_sample_item(
@@ -437,3 +1014,1333 @@ class PrivateTodoItemApiTest(TestCase):
         res = self.client.delete(get_todo_item_detail_url(item.id + 1))
 
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TodoItemFilterApiTest(TestCase):
+    """Test filtering, searching and ordering the item list"""
+
+    def setUp(self):
+        self.user = create_user(username='username', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.category = create_sample_cateory(self.user, 'cat1')
+        now = timezone.now()
+        self.items = {}
+        for i, (name, done) in enumerate([
+                ('buy milk', False), ('Buy bread', True),
+                ('call mom', False), ('clean desk', True)]):
+            item = create_sample_item(self.category, name)
+            item.done = done
+            item.date_created = now + timedelta(minutes=i)
+            item.save()
+            self.items[name] = item.id
+
+    def list_names(self, **params):
+        params.setdefault('category_id', self.category.id)
+        names = []
+        url = TODO_ITEM_LIST_URL
+        while url:
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            names += [item['name'] for item in res.data['results']]
+            url, params = res.data['next'], None
+        return names
+
+    def test_filter_done(self):
+        """Test filtering items by their done flag"""
+        self.assertEqual(
+            self.list_names(done='true'), ['clean desk', 'Buy bread'])
+        self.assertEqual(
+            self.list_names(done='False'), ['call mom', 'buy milk'])
+
+    def test_filter_done_invalid(self):
+        """Test an invalid done filter"""
+        res = self.client.get(TODO_ITEM_LIST_URL, {
+            'category_id': self.category.id, 'done': 'yes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search(self):
+        """Test searching item names by substring and prefix"""
+        self.assertEqual(
+            self.list_names(search='BREAD'), ['Buy bread'])
+        self.assertEqual(
+            self.list_names(prefix='buy'), ['Buy bread', 'buy milk'])
+        self.assertEqual(
+            self.list_names(prefix='c', done='true'), ['clean desk'])
+
+    def test_ordering(self):
+        """Test ordering by each whitelisted key, paged by the keyset"""
+        self.assertEqual(
+            self.list_names(ordering='name', page_size=1),
+            ['Buy bread', 'buy milk', 'call mom', 'clean desk'])
+        self.assertEqual(
+            self.list_names(ordering='-name', page_size=3),
+            ['clean desk', 'call mom', 'buy milk', 'Buy bread'])
+        self.assertEqual(
+            self.list_names(ordering='date_created', page_size=2),
+            ['buy milk', 'Buy bread', 'call mom', 'clean desk'])
+        self.assertEqual(
+            self.list_names(ordering='done', page_size=1),
+            ['call mom', 'buy milk', 'clean desk', 'Buy bread'])
+
+    def test_ordering_invalid(self):
+        """Test ordering by a field outside the whitelist"""
+        for ordering in ('seq', 'name,done', '-'):
+            res = self.client.get(TODO_ITEM_LIST_URL, {
+                'category_id': self.category.id, 'ordering': ordering})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CrossCategoryItemApiTest(TestCase):
+    """Test listing the items of several categories in one request"""
+
+    def setUp(self):
+        self.user = create_user(username='username', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.cat1 = create_sample_cateory(self.user, 'cat1')
+        self.cat2 = create_sample_cateory(self.user, 'cat2')
+        self.cat3 = create_sample_cateory(self.user, 'cat3')
+        for category in (self.cat2, self.cat1, self.cat3):
+            for i in range(2):
+                create_sample_item(category, '%s-item%d' % (category.name, i))
+        create_sample_item(create_sample_cateory(
+            create_user('username2', 'password'), 'cat'), 'other')
+
+    def list_items(self, **params):
+        items = []
+        url = TODO_ITEM_LIST_URL
+        while url:
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            items += res.data['results']
+            url, params = res.data['next'], None
+        return [(item['category_id'], item['name']) for item in items]
+
+    def test_list_category_id_in(self):
+        """Test listing the items of chosen categories grouped by category"""
+        items = self.list_items(
+            category_id__in='%d,%d' % (self.cat2.id, self.cat1.id),
+            page_size=3)
+
+        self.assertEqual(items, [
+            (self.cat1.id, 'cat1-item1'), (self.cat1.id, 'cat1-item0'),
+            (self.cat2.id, 'cat2-item1'), (self.cat2.id, 'cat2-item0'),
+        ])
+
+    def test_list_all(self):
+        """Test listing the items of all categories of the user"""
+        items = self.list_items(all='true', ordering='-name', page_size=4)
+
+        self.assertEqual(items, [
+            (self.cat3.id, 'cat3-item1'), (self.cat3.id, 'cat3-item0'),
+            (self.cat2.id, 'cat2-item1'), (self.cat2.id, 'cat2-item0'),
+            (self.cat1.id, 'cat1-item1'), (self.cat1.id, 'cat1-item0'),
+        ])
+
+    def test_list_all_query_budget(self):
+        """Test that all items are listed without per-category queries"""
+        # category ids, list version for the ETag, then the page itself
+        with self.assertNumQueries(3):
+            res = self.client.get(TODO_ITEM_LIST_URL, {'all': 'true'})
+
+        self.assertEqual(len(res.data['results']), 6)
+
+    @patch.object(TodoItemViewSet, 'MAX_CATEGORIES', 2)
+    def test_list_all_beyond_max_categories(self):
+        """Test that many categories are joined instead of listed by id"""
+        with CaptureQueriesContext(connection) as queries:
+            items = self.list_items(all='true', ordering='-name', page_size=4)
+
+        self.assertEqual(items, [
+            (self.cat3.id, 'cat3-item1'), (self.cat3.id, 'cat3-item0'),
+            (self.cat2.id, 'cat2-item1'), (self.cat2.id, 'cat2-item0'),
+            (self.cat1.id, 'cat1-item1'), (self.cat1.id, 'cat1-item0'),
+        ])
+        self.assertFalse([
+            query for query in queries if ' IN (' in query['sql']])
+
+    def test_list_category_id_in_invalid(self):
+        """Test listing foreign, malformed or too many categories"""
+        other = Category.objects.exclude(user=self.user).get()
+        too_many = ','.join(str(i) for i in range(
+            TodoItemViewSet.MAX_CATEGORIES + 1))
+
+        for category_ids in ('%d' % other.id, '%d,abc' % self.cat1.id, '',
+                             too_many):
+            res = self.client.get(
+                TODO_ITEM_LIST_URL, {'category_id__in': category_ids})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_category_id_in_skips_foreign(self):
+        """Test that foreign categories never contribute items"""
+        other = Category.objects.exclude(user=self.user).get()
+
+        items = self.list_items(
+            category_id__in='%d,%d' % (self.cat1.id, other.id))
+
+        self.assertEqual(
+            {category_id for category_id, _ in items}, {self.cat1.id})
+
+
+class TodoItemListSerializerTest(TestCase):
+    """Test the fast path serializer of item lists"""
+
+    def setUp(self):
+        user = create_user(username='username', password='password')
+        category = create_sample_cateory(user, 'cat1')
+        create_sample_item(category, 'item1')
+        TodoItem.objects.create(category=category, name='ítem 2', done=True)
+        TodoItem.objects.filter(name='item1').update(
+            date_created=timezone.now().replace(microsecond=0))
+        self.queryset = TodoItem.objects.order_by('id')
+
+    def assertSameAsModelSerializer(self):
+        self.assertEqual(
+            TodoItemListSerializer(
+                TodoItemListSerializer.get_rows(self.queryset)).data,
+            TodoItemSerializer(self.queryset, many=True).data
+        )
+
+    def test_fields(self):
+        """Test the list serializer has the fields of TodoItemSerializer"""
+        self.assertEqual(TodoItemListSerializer.fields,
+                         TodoItemSerializer.Meta.fields)
+
+    def test_same_output(self):
+        """Test the output matches TodoItemSerializer"""
+        self.assertSameAsModelSerializer()
+
+    def test_same_output_in_other_timezone(self):
+        """Test datetimes are converted to the current timezone"""
+        with timezone.override('Asia/Hong_Kong'):
+            self.assertSameAsModelSerializer()
+
+    @override_settings(REST_FRAMEWORK={'DATETIME_FORMAT': '%Y-%m-%d %H:%M'})
+    def test_same_output_with_datetime_format(self):
+        """Test a configured datetime format is respected"""
+        self.assertSameAsModelSerializer()
+        self.assertRegex(
+            TodoItemListSerializer(TodoItemListSerializer.get_rows(
+                self.queryset)).data[0]['date_created'],
+            r'^\d{4}-\d\d-\d\d \d\d:\d\d$')
+
+
+class PrivateTodoItemBulkApiTest(TestCase):
+    """Test the bulk endpoint for todo items"""
+
+    def setUp(self):
+        self.user = create_user(username='username', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.category = create_sample_cateory(self.user, 'cat1')
+
+    def test_login_required(self):
+        """Test that authentication is required for the bulk endpoint"""
+        res = APIClient().post(
+            TODO_ITEM_BULK_URL, {'operations': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_bulk_operations(self):
+        """Test creating, updating and deleting items in one request"""
+        item1 = create_sample_item(self.category, 'item1')
+        item2 = create_sample_item(self.category, 'item2')
+        category2 = create_sample_cateory(self.user, 'cat2')
+
+        payload = {'operations': [
+            {'op': 'create',
+             'data': {'name': 'new', 'category_id': self.category.id}},
+            {'op': 'update', 'id': item1.id,
+             'data': {'done': True, 'category_id': category2.id}},
+            {'op': 'delete', 'id': item2.id},
+        ]}
+        res = self.client.post(TODO_ITEM_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data['results']
+        self.assertEqual(
+            [result['status'] for result in results],
+            [status.HTTP_201_CREATED, status.HTTP_200_OK,
+             status.HTTP_204_NO_CONTENT]
+        )
+
+        created = TodoItem.objects.get(id=results[0]['id'])
+        self.assertEqual(created.name, 'new')
+        self.assertEqual(created.category_id, self.category.id)
+        self.assertEqual(results[0]['item'], TodoItemSerializer(created).data)
+
+        item1.refresh_from_db()
+        self.assertTrue(item1.done)
+        self.assertEqual(item1.category_id, category2.id)
+        self.assertFalse(TodoItem.objects.filter(id=item2.id).exists())
+
+    def test_bulk_invalid_category_rolls_back(self):
+        """Test that one invalid operation rejects the whole batch"""
+        item = create_sample_item(self.category, 'item')
+        other_category = create_sample_cateory(
+            create_user('username2', 'password'), 'cat')
+
+        payload = {'operations': [
+            {'op': 'delete', 'id': item.id},
+            {'op': 'create',
+             'data': {'name': 'new', 'category_id': other_category.id}},
+        ]}
+        res = self.client.post(TODO_ITEM_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['operations'][0], {})
+        self.assertIn('data', res.data['operations'][1])
+        self.assertTrue(TodoItem.objects.filter(id=item.id).exists())
+        self.assertFalse(TodoItem.objects.filter(name='new').exists())
+
+    def test_bulk_other_users_item(self):
+        """Test that items of another user cannot be changed"""
+        other_item = create_sample_item(create_sample_cateory(
+            create_user('username2', 'password'), 'cat'), 'item')
+
+        payload = {'operations': [
+            {'op': 'update', 'id': other_item.id, 'data': {'done': True}},
+        ]}
+        res = self.client.post(TODO_ITEM_BULK_URL, payload, format='json')
+
+        other_item.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(other_item.done)
+
+    def test_bulk_invalid_operation(self):
+        """Test operations with missing or invalid fields"""
+        payload = {'operations': [
+            {'op': 'create', 'data': {'name': '  ',
+                                      'category_id': self.category.id}},
+            {'op': 'update', 'data': {'done': True}},
+            {'op': 'rename', 'id': 1},
+        ]}
+        res = self.client.post(TODO_ITEM_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['operations']), 3)
+
+    def test_bulk_ownership_checked_once(self):
+        """Test that ownership of a batch is checked with one query each"""
+        items = [create_sample_item(self.category, 'item%d' % i)
+                 for i in range(5)]
+        payload = {'operations': [
+            {'op': 'update', 'id': item.id, 'data': {'done': True}}
+            for item in items
+        ]}
+
+        # items, savepoint, sequence update and read, items again, bulk
+        # update, counter update, release
+        with self.assertNumQueries(8):
+            res = self.client.post(TODO_ITEM_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            TodoItem.objects.filter(category=self.category, done=True)
+            .count(), 5)
+
+
+@skipUnless(connection.vendor == 'sqlite',
+            'EXPLAIN QUERY PLAN and its output are SQLite specific')
+class QueryPlanTest(TestCase):
+    """Test the todo viewset queries are served by indexes"""
+
+    def setUp(self):
+        self.user = create_user(username='username', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.category = create_sample_cateory(self.user, 'cat1')
+        self.items = [create_sample_item(self.category, 'item%d' % i)
+                      for i in range(3)]
+
+    def assertIndexedQueries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            res = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(res.status_code, 400, res.content)
+
+        explained = 0
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+            explained += 1
+            for step in plan:
+                self.assertFalse(
+                    step.startswith('SCAN') or 'TEMP B-TREE' in step,
+                    '%s\n%s' % (sql, '\n'.join(plan)))
+        self.assertGreater(explained, 0)
+        return res
+
+    def test_category_queries(self):
+        """Test the category list, create, update and delete queries"""
+        self.assertIndexedQueries('get', CATEGORY_LIST_URL)
+        self.assertIndexedQueries('post', CATEGORY_LIST_URL, {'name': 'new'})
+        url = get_category_detail_url(self.category.id)
+        self.assertIndexedQueries('patch', url, {'name': 'renamed'})
+        self.assertIndexedQueries('delete', url)
+
+    def test_item_list_queries(self):
+        """Test the item list queries, first and later pages"""
+        url = '%s?category_id=%d&page_size=2' % (
+            TODO_ITEM_LIST_URL, self.category.id)
+        res = self.assertIndexedQueries('get', url)
+        self.assertIndexedQueries('get', res.data['next'])
+
+    def test_item_list_filter_queries(self):
+        """Test the filtered and ordered item list queries"""
+        for params in ('done=true', 'done=false&ordering=-date_created',
+                       'ordering=name', 'ordering=-name', 'ordering=done',
+                       'ordering=-done', 'ordering=date_created',
+                       'prefix=item', 'search=item'):
+            url = '%s?category_id=%d&page_size=2&%s' % (
+                TODO_ITEM_LIST_URL, self.category.id, params)
+            res = self.assertIndexedQueries('get', url)
+            if res.data['next']:
+                self.assertIndexedQueries('get', res.data['next'])
+
+    def test_item_list_cross_category_queries(self):
+        """Test the item list queries over several categories"""
+        category2 = create_sample_cateory(self.user, 'cat2')
+        create_sample_item(category2, 'item')
+        for params in ('all=true', 'all=true&ordering=date_created',
+                       'all=true&ordering=name', 'all=true&ordering=-name',
+                       'all=true&ordering=done', 'all=true&ordering=-done',
+                       'category_id__in=%d,%d' % (
+                           self.category.id, category2.id)):
+            url = '%s?page_size=2&%s' % (TODO_ITEM_LIST_URL, params)
+            res = self.assertIndexedQueries('get', url)
+            if res.data['next']:
+                self.assertIndexedQueries('get', res.data['next'])
+
+    def test_item_detail_queries(self):
+        """Test the item create, retrieve, update and delete queries"""
+        self.assertIndexedQueries('post', TODO_ITEM_LIST_URL, {
+            'name': 'new', 'category_id': self.category.id})
+        url = get_todo_item_detail_url(self.items[0].id)
+        self.assertIndexedQueries('get', url)
+        self.assertIndexedQueries('patch', url, {'done': True})
+        self.assertIndexedQueries('delete', url)
+
+    def test_item_bulk_queries(self):
+        """Test the bulk item queries"""
+        self.assertIndexedQueries('post', TODO_ITEM_BULK_URL, {'operations': [
+            {'op': 'create',
+             'data': {'name': 'new', 'category_id': self.category.id}},
+            {'op': 'update', 'id': self.items[0].id, 'data': {'done': True}},
+            {'op': 'delete', 'id': self.items[1].id},
+        ]})
+
+
+class SyncApiTest(TestCase):
+    """Test the incremental sync endpoint"""
+
+    def setUp(self):
+        self.user = create_user(username='username', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def sync(self, since=None):
+        params = {} if since is None else {'since': since}
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_login_required(self):
+        """Test that authentication is required for syncing"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_full_sync(self):
+        """Test that a sync without a token returns everything"""
+        res = self.client.post(CATEGORY_LIST_URL, {'name': 'cat1'})
+        self.client.post(TODO_ITEM_LIST_URL, {
+            'name': 'item1', 'category_id': res.data['id']})
+        create_sample_cateory(create_user('username2', 'password'), 'cat')
+
+        data = self.sync()
+
+        self.assertEqual(data['token'], 2)
+        self.assertEqual([c['name'] for c in data['categories']], ['cat1'])
+        self.assertEqual(data['items'][0]['name'], 'item1')
+        self.assertEqual(data['items'][0]['category_id'], res.data['id'])
+        self.assertEqual(data['deleted'], {'categories': [], 'items': []})
+
+    def test_full_sync_unsequenced_rows(self):
+        """Test that a full sync returns rows written outside the API"""
+        category = create_sample_cateory(self.user, 'cat1')
+        item = create_sample_item(category, 'item1')
+
+        data = self.sync(0)
+
+        self.assertEqual([c['id'] for c in data['categories']],
+                         [category.id])
+        self.assertEqual([i['id'] for i in data['items']], [item.id])
+
+    def test_incremental_sync(self):
+        """Test that only changes after the token are returned"""
+        category_id = self.client.post(
+            CATEGORY_LIST_URL, {'name': 'cat1'}).data['id']
+        item1_id = self.client.post(TODO_ITEM_LIST_URL, {
+            'name': 'item1', 'category_id': category_id}).data['id']
+        item2_id = self.client.post(TODO_ITEM_LIST_URL, {
+            'name': 'item2', 'category_id': category_id}).data['id']
+        token = self.sync()['token']
+
+        self.client.patch(get_todo_item_detail_url(item1_id), {'done': True})
+        self.client.delete(get_todo_item_detail_url(item2_id))
+        data = self.sync(token)
+
+        # The category changed too, through its counters.
+        self.assertEqual(
+            [(c['id'], c['item_count'], c['done_count'])
+             for c in data['categories']],
+            [(category_id, 1, 1)])
+        self.assertEqual([i['id'] for i in data['items']], [item1_id])
+        self.assertEqual(data['deleted']['items'], [item2_id])
+        self.assertEqual(self.sync(data['token'])['items'], [])
+
+    def test_sync_category_delete(self):
+        """Test that deleting a category tombstones its items too"""
+        category_id = self.client.post(
+            CATEGORY_LIST_URL, {'name': 'cat1'}).data['id']
+        item_id = self.client.post(TODO_ITEM_LIST_URL, {
+            'name': 'item1', 'category_id': category_id}).data['id']
+        token = self.sync()['token']
+
+        self.client.delete(get_category_detail_url(category_id))
+        data = self.sync(token)
+
+        self.assertEqual(data['deleted'], {
+            'categories': [category_id], 'items': [item_id]})
+
+    def test_sync_bulk_operations(self):
+        """Test that bulk operations are visible to sync"""
+        category = Category.objects.get(id=self.client.post(
+            CATEGORY_LIST_URL, {'name': 'cat1'}).data['id'])
+        item = create_sample_item(category, 'item')
+        token = self.sync()['token']
+
+        self.client.post(TODO_ITEM_BULK_URL, {'operations': [
+            {'op': 'create',
+             'data': {'name': 'new', 'category_id': category.id}},
+            {'op': 'delete', 'id': item.id},
+        ]}, format='json')
+        data = self.sync(token)
+
+        self.assertEqual([i['name'] for i in data['items']], ['new'])
+        self.assertEqual(data['deleted']['items'], [item.id])
+
+    def test_sync_invalid_token(self):
+        """Test syncing with a malformed token"""
+        for since in ('abc', -1):
+            res = self.client.get(SYNC_URL, {'since': since})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sync_token_expired_after_purge(self):
+        """Test that tokens older than purged tombstones are rejected"""
+        category_id = self.client.post(
+            CATEGORY_LIST_URL, {'name': 'cat1'}).data['id']
+        token = self.sync()['token']
+        self.client.delete(get_category_detail_url(category_id))
+        Tombstone.objects.update(
+            deleted_at=timezone.now() - timedelta(days=31))
+
+        call_command('purge_tombstones', days=30, stdout=StringIO())
+
+        self.assertFalse(Tombstone.objects.exists())
+        res = self.client.get(SYNC_URL, {'since': token})
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+        self.assertEqual(self.sync()['categories'], [])
+
+    def test_purge_in_batches(self):
+        """Test that batches purge every user's tombstones up to the last"""
+        other = APIClient()
+        other.force_authenticate(user=create_user('username2', 'password'))
+        for client in (self.client, other, self.client):
+            category_id = client.post(
+                CATEGORY_LIST_URL, {'name': 'cat1'}).data['id']
+            client.delete(get_category_detail_url(category_id))
+        Tombstone.objects.update(
+            deleted_at=timezone.now() - timedelta(days=31))
+
+        out = StringIO()
+        call_command('purge_tombstones', days=30, batch_size=2, stdout=out)
+
+        self.assertFalse(Tombstone.objects.exists())
+        self.assertIn('Purged 3 tombstones', out.getvalue())
+        self.assertEqual(
+            SyncSequence.objects.get(user=self.user).purged_through,
+            SyncSequence.objects.get(user=self.user).value)
+
+    def test_purge_keeps_recent_tombstones(self):
+        """Test that tombstones inside the retention period are kept"""
+        category_id = self.client.post(
+            CATEGORY_LIST_URL, {'name': 'cat1'}).data['id']
+        token = self.sync()['token']
+        self.client.delete(get_category_detail_url(category_id))
+
+        call_command('purge_tombstones', days=30, stdout=StringIO())
+
+        self.assertEqual(
+            self.sync(token)['deleted']['categories'], [category_id])
+
+
+class ExportApiTest(TestCase):
+    """Test the streaming export of all todos"""
+
+    def setUp(self):
+        self.user = create_user(username='username', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_todos(self):
+        category1 = create_sample_cateory(self.user, 'cat1')
+        category2 = create_sample_cateory(self.user, 'cat2')
+        create_sample_item(category1, 'item1')
+        create_sample_item(category2, 'item2')
+        create_sample_item(category1, 'item3')
+        other = create_sample_cateory(
+            create_user('username2', 'password'), 'cat3')
+        create_sample_item(other, 'item4')
+
+        categories = Category.objects.filter(user=self.user)\
+            .order_by('name')
+        items = TodoItem.objects.filter(category__user=self.user)\
+            .order_by('category_id', '-date_created', '-id')
+        return (
+            json.loads(json.dumps(
+                CategorySerializer(categories, many=True).data)),
+            json.loads(json.dumps(
+                TodoItemSerializer(items, many=True).data)),
+        )
+
+    def export(self, **params):
+        res = self.client.get(EXPORT_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return res, b''.join(res.streaming_content).decode()
+
+    def test_login_required(self):
+        """Test that authentication is required for exporting"""
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_ndjson(self):
+        """Test exporting the user's todos one record per line"""
+        categories, items = self.create_todos()
+
+        res, content = self.export()
+
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertIn('todos.ndjson', res['Content-Disposition'])
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(records, [
+            {'type': 'category', **category} for category in categories
+        ] + [
+            {'type': 'item', **item} for item in items
+        ])
+
+    def test_export_json(self):
+        """Test exporting the user's todos as one JSON document"""
+        categories, items = self.create_todos()
+
+        res, content = self.export(output='json')
+
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(content), {
+            'categories': categories, 'items': items})
+
+    def test_export_json_empty(self):
+        """Test exporting an account without todos is still valid JSON"""
+        res, content = self.export(output='json')
+
+        self.assertEqual(json.loads(content), {
+            'categories': [], 'items': []})
+
+    def test_export_chunks(self):
+        """Test records are streamed in several chunks"""
+        self.create_todos()
+
+        with patch('todos.export.CHUNK_SIZE', 1), \
+                patch('todos.export.CATEGORY_BATCH_SIZE', 1):
+            res = self.client.get(EXPORT_URL, {'output': 'json'})
+            chunks = list(res.streaming_content)
+
+        # Opening, two categories, separator, three items and closing.
+        self.assertEqual(len(chunks), 8)
+        self.assertEqual(len(json.loads(b''.join(chunks))['items']), 3)
+
+    def test_export_invalid_output(self):
+        """Test an unknown export output is rejected"""
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_queries(self):
+        """Test the export reads categories and items in one query each"""
+        self.create_todos()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.export()
+
+        self.assertEqual(len(queries), 2)
+
+
+class ImportApiTest(TestCase):
+    """Test the bulk import of todos"""
+
+    def setUp(self):
+        self.user = create_user(username='username', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        category_list_cache.cache.clear()
+
+    def post(self, content, input_format='ndjson'):
+        return self.client.post(
+            '%s?input=%s' % (IMPORT_URL, input_format),
+            {'file': SimpleUploadedFile(
+                'todos.%s' % input_format, content.encode())},
+            format='multipart')
+
+    def get_items(self):
+        return list(TodoItem.objects.filter(category__user=self.user)
+                    .order_by('id').values_list('category__name', 'name',
+                                                'done'))
+
+    def test_login_required(self):
+        """Test that authentication is required for importing"""
+        res = APIClient().post(IMPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_import_export_round_trip(self):
+        """Test an NDJSON export imports into another account"""
+        category = create_sample_cateory(self.user, 'cat1')
+        create_sample_cateory(self.user, 'cat2')
+        create_sample_item(category, 'item1')
+        TodoItem.objects.create(category=category, name='item2', done=True)
+        content = b''.join(
+            self.client.get(EXPORT_URL).streaming_content).decode()
+
+        self.client.force_authenticate(
+            user=create_user('username2', 'password'))
+        res = self.post(content)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data, {'categories': 2, 'items': 2})
+        categories = self.client.get(CATEGORY_LIST_URL).data
+        self.assertEqual(
+            [(c['name'], c['item_count'], c['done_count'])
+             for c in categories],
+            [('cat1', 2, 1), ('cat2', 0, 0)])
+
+    def test_import_csv(self):
+        """Test importing items from CSV into new and existing categories"""
+        category = create_sample_cateory(self.user, 'cat1')
+
+        res = self.post(
+            'category,name,done\n'
+            'cat1,item1,\n'
+            'cat2,"item2, quoted",true\n'
+            ' cat1 ,item3,1\n', 'csv')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data, {'categories': 1, 'items': 3})
+        self.assertEqual(self.get_items(), [
+            ('cat1', 'item1', False),
+            ('cat2', 'item2, quoted', True),
+            ('cat1', 'item3', True),
+        ])
+        category.refresh_from_db()
+        self.assertEqual((category.item_count, category.done_count), (2, 1))
+
+    def test_import_invalid_line(self):
+        """Test an invalid line is reported and nothing is imported"""
+        res = self.post(
+            '{"type": "item", "category": "cat1", "name": "item1"}\n'
+            '{"type": "item", "category": "cat1", "name": ""}\n')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data, ['Line 2: Invalid name'])
+        self.assertFalse(Category.objects.filter(user=self.user).exists())
+
+    def test_import_unknown_category_id(self):
+        """Test items must refer to a category record of the file"""
+        res = self.post(
+            '{"type": "item", "category_id": 1, "name": "item1"}\n')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data, ['Line 1: Invalid category'])
+
+    def test_import_invalid_csv_header(self):
+        """Test a CSV file without the required columns is rejected"""
+        res = self.post('name\nitem1\n', 'csv')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_invalid_input(self):
+        """Test an unknown import input is rejected"""
+        res = self.post('', 'xml')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_chunks(self):
+        """Test items are inserted in chunks with their own sequence"""
+        content = 'category,name\n' + ''.join(
+            'cat%d,item%d\n' % (n % 2, n) for n in range(5))
+
+        with patch('todos.importer.CHUNK_SIZE', 2), \
+                CaptureQueriesContext(connection) as queries:
+            res = self.post(content, 'csv')
+
+        self.assertEqual(res.data, {'categories': 2, 'items': 5})
+        self.assertEqual(
+            list(TodoItem.objects.order_by('id').values_list(
+                'seq', flat=True)), [2, 2, 3, 3, 4])
+        self.assertEqual(
+            list(Category.objects.order_by('name').values_list(
+                'item_count', 'seq')), [(3, 4), (2, 3)])
+        # Categories: sequence (2), lookup, insert and lookup; per chunk:
+        # sequence (2), insert and a counter update per category (2, 2, 1).
+        statements = [
+            query['sql'] for query in queries.captured_queries
+            if 'SAVEPOINT' not in query['sql']
+        ]
+        self.assertEqual(len(statements), 19)
+
+    def test_import_invalidates_category_cache(self):
+        """Test the cached category list shows imported categories"""
+        self.client.get(CATEGORY_LIST_URL)
+
+        self.post('{"type": "category", "name": "cat1"}\n')
+
+        res = self.client.get(CATEGORY_LIST_URL)
+        self.assertEqual([c['name'] for c in res.data], ['cat1'])
+
+    def test_import_command(self):
+        """Test importing a file with the import_todos command"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'todos.csv')
+        with open(path, 'w') as f:
+            f.write('category,name,done\ncat1,item1,yes\n')
+
+        out = StringIO()
+        call_command('import_todos', path, user='username', stdout=out)
+
+        self.assertIn('Imported 1 items and 1 new categories',
+                      out.getvalue())
+        self.assertEqual(self.get_items(), [('cat1', 'item1', True)])
+
+        with self.assertRaisesMessage(CommandError, 'Invalid done'):
+            with open(path, 'w') as f:
+                f.write('category,name,done\ncat1,item2,maybe\n')
+            call_command('import_todos', path, user='username',
+                         stdout=StringIO())
+
+
+class AsyncApiTest(TestCase):
+    """Test the async variants of the todo endpoints"""
+
+    def setUp(self):
+        self.user = create_user(username='username', password='password')
+        self.category = create_sample_cateory(self.user, 'cat1')
+        token = LoginSerializer.get_token(self.user).access_token
+        self.authorization = 'Bearer %s' % token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.authorization)
+        category_list_cache.cache.clear()
+
+    def test_login_required(self):
+        """Test that authentication is required for the async endpoints"""
+        res = APIClient().get(ASYNC_CATEGORY_LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('WWW-Authenticate', res)
+
+    def test_list_categories(self):
+        """Test that the async category list matches the sync one"""
+        create_sample_cateory(self.user, 'cat0')
+
+        res = self.client.get(ASYNC_CATEGORY_LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), self.client.get(CATEGORY_LIST_URL).data)
+
+    def test_create_category(self):
+        """Test creating categories through the async endpoint"""
+        res = self.client.post(
+            ASYNC_CATEGORY_LIST_URL, {'name': 'cat2'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Category.objects.filter(
+            id=res.json()['id'], user=self.user, name='cat2').exists())
+
+        res = self.client.post(
+            ASYNC_CATEGORY_LIST_URL, {'name': 'cat2'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_items(self):
+        """Test that the async item list matches the sync one"""
+        create_sample_item(self.category, 'item1')
+        create_sample_item(self.category, 'item2')
+        params = {'category_id': self.category.id, 'page_size': 1}
+
+        res = self.client.get(ASYNC_TODO_ITEM_LIST_URL, params)
+        sync_res = self.client.get(TODO_ITEM_LIST_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['results'], sync_res.data['results'])
+        self.assertIsNotNone(res.json()['next'])
+
+    def test_list_items_invalid_category(self):
+        """Test listing the items of a foreign category"""
+        other = create_sample_cateory(
+            create_user('username2', 'password'), 'cat')
+
+        res = self.client.get(
+            ASYNC_TODO_ITEM_LIST_URL, {'category_id': other.id})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_and_retrieve_item(self):
+        """Test creating and retrieving an item asynchronously"""
+        res = self.client.post(ASYNC_TODO_ITEM_LIST_URL, {
+            'name': 'item', 'category_id': self.category.id}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self.client.get(reverse(
+            'todo:async-todoitem-detail', args=[res.json()['id']]))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['name'], 'item')
+
+    def test_retrieve_other_users_item(self):
+        """Test that items of other users are not found"""
+        item = create_sample_item(create_sample_cateory(
+            create_user('username2', 'password'), 'cat'), 'item')
+
+        res = self.client.get(
+            reverse('todo:async-todoitem-detail', args=[item.id]))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_asgi_list_categories(self):
+        """Test listing categories through the ASGI handler"""
+        res = await self.async_client.get(
+            ASYNC_CATEGORY_LIST_URL, authorization=self.authorization)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([c['name'] for c in res.json()], ['cat1'])
+
+    async def test_asgi_create_item(self):
+        """Test creating an item through the ASGI handler"""
+        res = await self.async_client.post(
+            ASYNC_TODO_ITEM_LIST_URL,
+            {'name': 'item', 'category_id': self.category.id},
+            content_type='application/json',
+            authorization=self.authorization)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        item = await sync_to_async(TodoItem.objects.get)(
+            id=res.json()['id'])
+        self.assertEqual(item.category_id, self.category.id)
+
+    async def test_asgi_export(self):
+        """Test streaming the export through the ASGI handler"""
+        await sync_to_async(create_sample_item)(self.category, 'item1')
+
+        res = await self.async_client.get(
+            EXPORT_URL, authorization=self.authorization)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        # Iterated like the project's ASGI handler does, the export reads
+        # the database while it streams.
+        content = b''.join([
+            part async for part in iterate_streaming_content(res)])
+        self.assertEqual(
+            [(record['type'], record['name'])
+             for record in map(json.loads, content.decode().splitlines())],
+            [('category', 'cat1'), ('item', 'item1')])
+
+    async def test_asgi_concurrent_requests(self):
+        """Test that the ASGI handler serves async views concurrently"""
+        async def get(view, request):
+            await asyncio.sleep(0.2)
+            return JsonResponse([], safe=False)
+
+        with patch.object(AsyncCategoryListView, 'get', get):
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(
+                self.async_client.get(
+                    ASYNC_CATEGORY_LIST_URL, authorization=self.authorization)
+                for _ in range(4)
+            ))
+            elapsed = time.perf_counter() - started
+
+        self.assertEqual([res.status_code for res in responses],
+                         [status.HTTP_200_OK] * 4)
+        # Served one at a time, by a sync-only middleware for instance,
+        # they would take 0.8 s.
+        self.assertLess(elapsed, 0.6)
+
+
+class QueryBudgetApiTest(TestCase):
+    """Test the query budget of every todo endpoint"""
+
+    def setUp(self):
+        category_list_cache.cache.clear()
+        self.user = create_user(username='username', password='password')
+        self.categories = [
+            create_sample_cateory(self.user, 'cat%d' % n) for n in range(3)]
+        self.items = [
+            create_sample_item(category, 'item%d' % n)
+            for category in self.categories for n in range(3)
+        ]
+        token = LoginSerializer.get_token(self.user).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % token)
+        # Budgets are for requests after the first of a token, whose user
+        # check is cached.
+        is_user_active(self.user.id)
+
+    def test_list_categories(self):
+        """Test listing categories, then from the cache"""
+        with query_budget(2):
+            res = self.client.get(CATEGORY_LIST_URL)
+        self.assertEqual(len(res.data), 3)
+
+        with query_budget(0):
+            self.client.get(CATEGORY_LIST_URL)
+
+    @query_budget(3)
+    def test_create_category(self):
+        """Test creating a category"""
+        res = self.client.post(
+            CATEGORY_LIST_URL, {'name': 'new'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    @query_budget(4)
+    def test_update_category(self):
+        """Test renaming a category"""
+        res = self.client.patch(
+            get_category_detail_url(self.categories[0].id),
+            {'name': 'new'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @query_budget(8)
+    def test_delete_category(self):
+        """Test deleting a category with its items and archived items"""
+        res = self.client.delete(
+            get_category_detail_url(self.categories[0].id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+    @query_budget(2)
+    def test_list_items(self):
+        """Test listing the items of a category"""
+        res = self.client.get(
+            TODO_ITEM_LIST_URL, {'category_id': self.categories[0].id})
+
+        self.assertEqual(len(res.data['results']), 3)
+
+    @query_budget(3)
+    def test_list_items_of_all_categories(self):
+        """Test listing the items of several categories"""
+        res = self.client.get(TODO_ITEM_LIST_URL, {'all': 'true'})
+
+        self.assertEqual(len(res.data['results']), 9)
+
+    @query_budget(5)
+    def test_create_item(self):
+        """Test creating an item"""
+        res = self.client.post(TODO_ITEM_LIST_URL, {
+            'name': 'new', 'category_id': self.categories[0].id,
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    @query_budget(1)
+    def test_retrieve_item(self):
+        """Test retrieving an item"""
+        res = self.client.get(get_todo_item_detail_url(self.items[0].id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @query_budget(8)
+    def test_update_item(self):
+        """Test moving an item to another category"""
+        res = self.client.patch(get_todo_item_detail_url(self.items[0].id), {
+            'done': True, 'category_id': self.categories[1].id,
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @query_budget(7)
+    def test_delete_item(self):
+        """Test deleting an item"""
+        res = self.client.delete(get_todo_item_detail_url(self.items[0].id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+    @query_budget(15)
+    def test_bulk(self):
+        """Test bulk operations only write per created item and category"""
+        # An insert per created item, for its id, and a counter update per
+        # category; the reads do not grow with the operations.
+        res = self.client.post(TODO_ITEM_BULK_URL, {'operations': [
+            {'op': 'create', 'data': {
+                'name': 'new%d' % n, 'category_id': category.id}}
+            for n, category in enumerate(self.categories)
+        ] + [
+            {'op': 'update', 'id': item.id, 'data': {'done': True}}
+            for item in self.items[:3]
+        ] + [
+            {'op': 'delete', 'id': item.id} for item in self.items[3:6]
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_sync(self):
+        """Test a full and an incremental sync"""
+        with query_budget(3):
+            res = self.client.get(SYNC_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with query_budget(4):
+            res = self.client.get(SYNC_URL, {'since': 1})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @query_budget(2)
+    def test_export(self):
+        """Test exporting all categories and items"""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(len(b''.join(res.streaming_content).splitlines()),
+                         12)
+
+    @query_budget(10)
+    def test_import(self):
+        """Test importing items into new and existing categories"""
+        upload = SimpleUploadedFile(
+            'todos.csv', b'category,name\ncat0,a\nnew,b\nnew,c\n')
+
+        res = self.client.post(
+            IMPORT_URL + '?input=csv', {'file': upload}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_async_categories(self):
+        """Test listing and creating categories asynchronously"""
+        with query_budget(1):
+            res = self.client.get(ASYNC_CATEGORY_LIST_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with query_budget(3):
+            res = self.client.post(
+                ASYNC_CATEGORY_LIST_URL, {'name': 'new'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_async_items(self):
+        """Test listing, creating and retrieving items asynchronously"""
+        with query_budget(2):
+            res = self.client.get(ASYNC_TODO_ITEM_LIST_URL,
+                                  {'category_id': self.categories[0].id})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with query_budget(5):
+            res = self.client.post(ASYNC_TODO_ITEM_LIST_URL, {
+                'name': 'new', 'category_id': self.categories[0].id,
+            }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        with query_budget(1):
+            res = self.client.get(reverse(
+                'todo:async-todoitem-detail', args=[res.json()['id']]))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class BenchApiCommandTest(TestCase):
+    """Test the API benchmark command"""
+
+    def test_bench_api(self):
+        """Test every endpoint is measured and the accounts removed"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            call_command(
+                'bench_api', items=30, users=2, categories=3, requests=4,
+                warmup=1, output=path, label='test', stdout=StringIO())
+            with open(path) as f:
+                report = json.load(f)
+
+        self.assertEqual(report['label'], 'test')
+        self.assertEqual(report['items'], 30)
+        self.assertEqual(
+            [result['endpoint'] for result in report['results']],
+            ['login', 'category_list', 'category_create', 'item_list',
+             'item_create', 'item_patch', 'item_delete'])
+        for result in report['results']:
+            self.assertEqual(result['errors'], 0, result)
+            self.assertEqual(result['requests'], 4)
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(TodoItem.objects.exists())
+
+
+class ArchiveTest(TestCase):
+    """Test archiving done items and listing them"""
+
+    def setUp(self):
+        category_list_cache.cache.clear()
+        self.user = create_user(username='username', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.category = create_sample_cateory(self.user, 'cat1')
+        self.items = [
+            create_sample_item(self.category, 'item%d' % n)
+            for n in range(6)
+        ]
+        # Items 0 to 3 are done, of which 0 to 2 long ago.
+        TodoItem.objects.filter(id__in=[
+            item.id for item in self.items[:4]]).update(done=True)
+        TodoItem.objects.filter(id__in=[
+            item.id for item in self.items[:3]]).update(
+            updated_at=timezone.now() - timedelta(days=40))
+        self.category.item_count, self.category.done_count = 6, 4
+        self.category.save()
+
+    def archive(self, **options):
+        out = StringIO()
+        call_command('archive_items', days=30, stdout=out, **options)
+        return out.getvalue()
+
+    def list_item_names(self, **params):
+        res = self.client.get(TODO_ITEM_LIST_URL, dict(
+            params, category_id=self.category.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in res.data['results']]
+
+    def test_archive_items(self):
+        """Test old done items are moved to the archive in batches"""
+        old = TodoItem.objects.get(id=self.items[0].id)
+
+        out = self.archive(batch_size=2)
+
+        self.assertIn('Archived 3 items', out)
+        self.assertEqual(len(out.splitlines()), 3)
+        self.assertEqual(
+            sorted(TodoItemArchive.objects.values_list('id', flat=True)),
+            [item.id for item in self.items[:3]])
+        self.assertEqual(
+            sorted(TodoItem.objects.values_list('id', flat=True)),
+            [item.id for item in self.items[3:]])
+        archived = TodoItemArchive.objects.get(id=old.id)
+        self.assertEqual(
+            (archived.category_id, archived.name, archived.done,
+             archived.date_created, archived.updated_at),
+            (old.category_id, old.name, old.done, old.date_created,
+             old.updated_at))
+
+        self.category.refresh_from_db()
+        self.assertEqual(
+            (self.category.item_count, self.category.done_count), (3, 1))
+        self.assertFalse(get_miscounted_categories().exists())
+
+    def test_archive_leaves_tombstones(self):
+        """Test archived items are reported deleted to sync clients"""
+        self.client.post(CATEGORY_LIST_URL, {'name': 'cat2'})
+        token = self.client.get(SYNC_URL).data['token']
+
+        self.archive()
+
+        res = self.client.get(SYNC_URL, {'since': token})
+        self.assertEqual(
+            sorted(res.data['deleted']['items']),
+            [item.id for item in self.items[:3]])
+        self.assertEqual(
+            [category['item_count'] for category in res.data['categories']],
+            [3])
+
+    def test_dry_run(self):
+        """Test a dry run only counts the items to archive"""
+        out = self.archive(dry_run=True)
+
+        self.assertIn('3 items would be archived', out)
+        self.assertFalse(TodoItemArchive.objects.exists())
+
+    def test_changed_item_not_archived(self):
+        """Test an item changed since it was picked is left in place"""
+        item = self.items[0]
+        TodoItem.objects.filter(id=item.id).update(done=False)
+
+        archived = archive_batch(
+            timezone.now() - timedelta(days=30), {self.user.id: [item.id]})
+
+        self.assertEqual(archived, 0)
+        self.assertTrue(TodoItem.objects.filter(id=item.id).exists())
+        self.assertFalse(TodoItemArchive.objects.exists())
+
+    def test_list_include_archived(self):
+        """Test archived items are only listed on request, merged in order"""
+        expected = self.list_item_names()
+        self.archive()
+
+        self.assertEqual(self.list_item_names(), expected[:3])
+        self.assertEqual(
+            self.list_item_names(include_archived='true'), expected)
+        self.assertEqual(
+            self.list_item_names(include_archived='true', ordering='name'),
+            sorted(expected))
+        self.assertEqual(
+            self.list_item_names(include_archived='true', done='false'),
+            expected[:2])
+
+    def test_list_include_archived_pages(self):
+        """Test paging through items and archived items"""
+        self.archive()
+        TodoItem.objects.filter(id=self.items[3].id).update(
+            date_created=timezone.now() - timedelta(days=50))
+        params = {'category_id': self.category.id, 'include_archived': 'true',
+                  'ordering': 'date_created', 'page_size': 4}
+
+        res = self.client.get(TODO_ITEM_LIST_URL, params)
+        names = [item['name'] for item in res.data['results']]
+        res = self.client.get(res.data['next'])
+        names += [item['name'] for item in res.data['results']]
+
+        self.assertEqual(
+            names, ['item3', 'item0', 'item1', 'item2', 'item4', 'item5'])
+        self.assertIsNone(res.data['next'])
+
+    def test_list_include_archived_etag(self):
+        """Test archiving changes the list and keeps the archive listed"""
+        params = {'category_id': self.category.id}
+        etag = self.client.get(TODO_ITEM_LIST_URL, params)['ETag']
+        names = self.list_item_names(include_archived='true')
+
+        self.archive()
+
+        res = self.client.get(
+            TODO_ITEM_LIST_URL, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.list_item_names(include_archived='true'), names)
+
+    def test_delete_category(self):
+        """Test deleting a category deletes its archived items"""
+        self.archive()
+
+        self.client.delete(get_category_detail_url(self.category.id))
+
+        self.assertFalse(TodoItemArchive.objects.exists())
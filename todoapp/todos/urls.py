@@ -1,7 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from todos.views import CategoryViewSet, TodoItemViewSet
+from todos.async_views import AsyncCategoryListView, \
+    AsyncTodoItemDetailView, AsyncTodoItemListView
+from todos.views import CategoryViewSet, TodoItemViewSet, SyncView, \
+    ExportView, ImportView
 
 router = DefaultRouter()
 router.register('categories', CategoryViewSet)
@@ -10,5 +13,14 @@ router.register('items', TodoItemViewSet)
 app_name = 'todo'
 
 urlpatterns = [
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('export/', ExportView.as_view(), name='export'),
+    path('import/', ImportView.as_view(), name='import'),
+    path('async/categories/', AsyncCategoryListView.as_view(),
+         name='async-category-list'),
+    path('async/items/', AsyncTodoItemListView.as_view(),
+         name='async-todoitem-list'),
+    path('async/items/<int:pk>/', AsyncTodoItemDetailView.as_view(),
+         name='async-todoitem-detail'),
     path('', include(router.urls)),
 ]
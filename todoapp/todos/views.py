@@ -1,10 +1,28 @@
 from django.core.exceptions import ObjectDoesNotExist
-from rest_framework import viewsets, mixins
+from django.http import StreamingHttpResponse
+from rest_framework import viewsets, mixins, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import SearchFilter
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from todos.models import Category, TodoItem
-from todos.serializers import CategorySerializer, TodoItemSerializer
+from todos.cache import category_list_cache
+from todos.conditional import get_list_validators, \
+    get_not_modified_response, set_list_validators
+from todos.export import stream_json, stream_ndjson
+from todos.filters import TodoItemFilter, TodoItemOrderingFilter
+from todos.importer import READERS, import_todos
+from todos.models import Category, TodoItem, TodoItemArchive
+from todos.pagination import KeysetPagination
+from todos.serializers import CategorySerializer, TodoItemSerializer, \
+    TodoItemBulkSerializer, TodoItemListSerializer
+from todos.services import get_category_list_entry, get_items_version, \
+    save_category, save_item
+from todos.sync import delete_category, delete_items, get_changes, \
+    get_sequence
 
 
 class CategoryViewSet(viewsets.GenericViewSet,
@@ -15,59 +33,201 @@ class CategoryViewSet(viewsets.GenericViewSet,
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = (IsAuthenticated,)
+    throttle_scope = 'categories'
 
     def get_queryset(self):
-        return self.queryset.filter(user=self.request.user).order_by('name')
+        return self.queryset.filter(user_id=self.request.user.id)\
+            .order_by('name')
+
+    def list(self, request, *args, **kwargs):
+        entry = category_list_cache.get_or_set(
+            request.user.id,
+            lambda: get_category_list_entry(request.user.id)
+        )
+        response = get_not_modified_response(request, entry['etag']) or \
+            Response(entry['data'])
+        return set_list_validators(
+            response, entry['etag'], entry['last_modified'])
 
     def perform_create(self, serializer):
-        if self.queryset.filter(
-                name=serializer.validated_data['name'],
-                user=self.request.user).exists():
-            raise ValidationError('Category name is already existed')
-        serializer.save(user=self.request.user)
+        save_category(serializer, self.request.user.id)
 
     def perform_update(self, serializer):
-        if 'name' in serializer.validated_data:
-            if self.queryset.filter(
-                    name=serializer.validated_data['name'],
-                    user=self.request.user).exists():
-                raise ValidationError('Category name is already existed')
+        save_category(serializer, self.request.user.id)
 
-        super().perform_update(serializer)
+    def perform_destroy(self, instance):
+        delete_category(instance)
 
 
 class TodoItemViewSet(viewsets.ModelViewSet):
     queryset = TodoItem.objects.all()
     serializer_class = TodoItemSerializer
     permission_classes = (IsAuthenticated,)
+    throttle_scope = 'items'
+    pagination_class = KeysetPagination
+    filter_backends = (TodoItemFilter, SearchFilter, TodoItemOrderingFilter)
+    search_fields = ('name',)
+    ordering = ('-date_created', '-id')
+    MAX_CATEGORIES = 100
 
     def get_object(self):
         try:
-            return self.queryset.get(id=self.kwargs['pk'])
-        except ObjectDoesNotExist:
+            return self.queryset.filter(
+                category__user_id=self.request.user.id
+            ).get(id=self.kwargs['pk'])
+        except (ObjectDoesNotExist, ValueError):
             raise NotFound('Invalid item pk')
 
     def get_queryset(self):
-        category = Category.objects.get(
-            id=self.request.query_params['category_id'])
-        if not category or self.request.user != category.user:
-            raise ValidationError('Invalid category id')
-        return self.queryset.filter(category=category)\
-            .order_by('-date_created')
+        self.category_ids = self.get_category_ids()
+        return self.filter_categories(self.queryset)
+
+    def filter_categories(self, queryset):
+        queryset = queryset.filter(category__user_id=self.request.user.id)
+        if self.category_ids is not None:
+            queryset = queryset.filter(category_id__in=self.category_ids)
+        return queryset.order_by('-date_created')
+
+    def get_category_ids(self):
+        params = self.request.query_params
+        try:
+            if 'category_id' in params:
+                return [int(params['category_id'])]
+            if 'category_id__in' in params:
+                category_ids = sorted({
+                    int(category_id)
+                    for category_id in params['category_id__in'].split(',')
+                })
+                if len(category_ids) <= self.MAX_CATEGORIES:
+                    return category_ids
+            elif params.get('all') == 'true':
+                # Listing the ids lets each category's items be read in
+                # index order, instead of sorting all items of the user.
+                # Beyond MAX_CATEGORIES the list is too long to send: None
+                # selects all categories of the user by a join instead, at
+                # the cost of sorting their items.
+                category_ids = sorted(Category.objects.filter(
+                    user_id=self.request.user.id
+                ).values_list('id', flat=True)[:self.MAX_CATEGORIES + 1])
+                if len(category_ids) <= self.MAX_CATEGORIES:
+                    return category_ids
+                return None
+        except ValueError:
+            pass
+        raise ValidationError('Invalid category id')
+
+    def get_archive_queryset(self):
+        return self.filter_categories(TodoItemArchive.objects.all())
+
+    def list(self, request, *args, **kwargs):
+        querysets = [self.filter_queryset(self.get_queryset())]
+        # Archived items are only read on request, the default list stays
+        # on the hot table.
+        if request.query_params.get('include_archived') == 'true':
+            querysets.append(
+                self.filter_queryset(self.get_archive_queryset()))
+        version, last_modified = get_items_version(
+            request.user.id, self.category_ids)
+        etag, last_modified = get_list_validators(
+            version, last_modified, request.get_full_path())
+
+        response = get_not_modified_response(request, etag)
+        if response is None:
+            page = self.paginator.paginate_querysets([
+                TodoItemListSerializer.get_rows(queryset)
+                for queryset in querysets
+            ], request, view=self)
+            response = self.get_paginated_response(
+                TodoItemListSerializer(page).data)
+        return set_list_validators(response, etag, last_modified)
 
     def perform_create(self, serializer):
-        category = Category.objects.get(
-            id=serializer.validated_data['category_id'])
-        if not category or self.request.user != category.user:
-            raise ValidationError('Invalid category')
-        serializer.save(category=category)
+        save_item(serializer, self.request.user.id)
 
     def perform_update(self, serializer):
-        if 'category_id' in serializer.validated_data:
-            category = Category.objects.get(
-                id=serializer.validated_data['category_id'])
-            if not category or self.request.user != category.user:
-                raise ValidationError('Invalid category')
-            serializer.save(category=category)
-        else:
-            super().perform_update(serializer)
+        save_item(serializer, self.request.user.id)
+
+    def perform_destroy(self, instance):
+        delete_items(self.request.user.id, [instance])
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        serializer = TodoItemBulkSerializer(
+            data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        return Response({'results': serializer.save()})
+
+
+class SyncView(APIView):
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = 'items'
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            if since < 0:
+                raise ValueError
+        except ValueError:
+            raise ValidationError('Invalid sync token')
+
+        # Read the token first: anything committed while the changes are
+        # read is simply sent again on the next sync.
+        token, purged_through = get_sequence(request.user.id)
+        if 0 < since < purged_through:
+            return Response(
+                {'detail': 'Sync token has expired, a full sync is required'},
+                status=status.HTTP_410_GONE
+            )
+
+        changes = get_changes(request.user.id, since)
+        return Response({
+            'token': token,
+            'categories': CategorySerializer(
+                changes['categories'], many=True).data,
+            'items': TodoItemListSerializer(
+                TodoItemListSerializer.get_rows(changes['items'])).data,
+            'deleted': {
+                'categories': changes['deleted']['category'],
+                'items': changes['deleted']['item'],
+            },
+        })
+
+
+class ExportView(APIView):
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = 'items'
+    outputs = {
+        'ndjson': (stream_ndjson, 'application/x-ndjson'),
+        'json': (stream_json, 'application/json'),
+    }
+
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in self.outputs:
+            raise ValidationError('Invalid export output, use one of %s' % (
+                ', '.join(self.outputs)))
+
+        stream, content_type = self.outputs[output]
+        response = StreamingHttpResponse(
+            stream(request.user.id), content_type=content_type)
+        response['Content-Disposition'] = \
+            'attachment; filename="todos.%s"' % output
+        return response
+
+
+class ImportView(APIView):
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = 'items'
+    parser_classes = (MultiPartParser,)
+
+    def post(self, request):
+        input_format = request.query_params.get('input', 'ndjson')
+        if input_format not in READERS:
+            raise ValidationError('Invalid import input, use one of %s' % (
+                ', '.join(READERS)))
+        if 'file' not in request.FILES:
+            raise ValidationError('No file given')
+
+        totals = import_todos(
+            request.user.id, request.FILES['file'], input_format)
+        return Response(totals, status=status.HTTP_201_CREATED)
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import \
+    JWTTokenUserAuthentication
+from rest_framework_simplejwt.models import TokenUser
+
+
+REVOCATION_KEY = 'user:active:%s'
+
+
+class StatelessUser(TokenUser):
+    """A user backed only by the claims of a validated access token."""
+
+    @cached_property
+    def is_active(self):
+        return self.token.get('is_active', True)
+
+
+class StatelessJWTAuthentication(JWTTokenUserAuthentication):
+    """
+    JWT authentication that trusts the signed token claims instead of
+    loading the user row on every request.
+
+    Deactivated or deleted users are still rejected once the revocation
+    cache entry of JWT_REVOCATION_CHECK_TTL seconds has expired.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+
+        if not user.is_active or not is_user_active(user.id):
+            raise AuthenticationFailed(
+                'User is inactive', code='user_inactive')
+
+        return user
+
+
+def _get_cache():
+    return caches[settings.JWT_REVOCATION_CACHE]
+
+
+def is_user_active(user_id):
+    ttl = settings.JWT_REVOCATION_CHECK_TTL
+    if not ttl:
+        return True
+
+    key = REVOCATION_KEY % user_id
+    active = _get_cache().get(key)
+    if active is None:
+        # A deleted user counts as inactive.
+        active = get_user_model().objects.filter(pk=user_id)\
+            .values_list('is_active', flat=True).first() or False
+        _get_cache().set(key, active, ttl)
+    return active
+
+
+def invalidate_user_active(user_id):
+    _get_cache().delete(REVOCATION_KEY % user_id)
@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+
+from user.hashing import hashing_pool
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend that verifies passwords on the hashing pool.
+
+    Passwords stored with an outdated hasher or work factor are rehashed
+    with the preferred hasher on a successful login.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so missing users take as long as wrong passwords.
+            hashing_pool.run(make_password, password)
+            return None
+
+        outdated = []
+        if not hashing_pool.run(
+                check_password, password, user.password, outdated.append):
+            return None
+        if not self.user_can_authenticate(user):
+            return None
+
+        if outdated:
+            user.password = hashing_pool.run(make_password, password)
+            user.save(update_fields=['password'])
+        return user
@@ -0,0 +1,67 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+
+
+class HashingPoolSaturated(Throttled):
+    default_detail = 'Too many password operations in progress.'
+    default_code = 'hashing_saturated'
+
+
+class HashingPool:
+    """
+    Bounded pool running the CPU-bound password hashing.
+
+    At most `workers` hashes run at once and at most `queue_depth` more
+    may wait; anything beyond that is rejected with a 429 right away
+    instead of tying up a request worker.
+    """
+
+    def __init__(self, workers=None, queue_depth=None):
+        self._workers = workers
+        self._queue_depth = queue_depth
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self):
+        return self._workers or settings.PASSWORD_HASHING_WORKERS
+
+    @property
+    def queue_depth(self):
+        if self._queue_depth is not None:
+            return self._queue_depth
+        return settings.PASSWORD_HASHING_QUEUE_DEPTH
+
+    def run(self, fn, *args, **kwargs):
+        self._start()
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolSaturated(wait=settings.PASSWORD_HASHING_RETRY)
+        try:
+            return self._executor.submit(fn, *args, **kwargs).result()
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+            self._executor = self._slots = None
+
+    def _start(self):
+        if self._executor is not None:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._slots = threading.BoundedSemaphore(
+                    self.workers + self.queue_depth)
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix='password-hashing'
+                )
+
+
+hashing_pool = HashingPool()
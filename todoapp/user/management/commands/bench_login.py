@@ -0,0 +1,63 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, \
+    make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from user.hashing import HashingPool
+
+
+class Command(BaseCommand):
+    help = 'Benchmark password verification (login) throughput per core'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasher', action='append', dest='hashers',
+            help='Hasher algorithm to benchmark, e.g. pbkdf2_sha256 or '
+                 'argon2 (repeatable, default: the preferred hasher)')
+        parser.add_argument(
+            '--logins', type=int, default=50,
+            help='Password checks per run')
+        parser.add_argument(
+            '--clients', type=int, default=os.cpu_count() or 1,
+            help='Concurrent clients submitting logins')
+
+    def handle(self, *args, **options):
+        hashers = options['hashers'] or [get_hasher().algorithm]
+        cores = os.cpu_count() or 1
+        pool = HashingPool(
+            workers=settings.PASSWORD_HASHING_WORKERS,
+            queue_depth=options['clients']
+        )
+
+        self.stdout.write('cores=%d pool_workers=%d clients=%d' % (
+            cores, pool.workers, options['clients']))
+        try:
+            for algorithm in hashers:
+                self._bench(pool, algorithm, options, cores)
+        finally:
+            pool.shutdown()
+
+    def _bench(self, pool, algorithm, options, cores):
+        try:
+            encoded = make_password('benchmark-password', hasher=algorithm)
+        except (ValueError, TypeError) as e:
+            raise CommandError('Hasher %s is unavailable: %s' % (
+                algorithm, e))
+
+        def login(_):
+            return pool.run(check_password, 'benchmark-password', encoded)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['clients']) as clients:
+            assert all(clients.map(login, range(options['logins'])))
+        elapsed = time.perf_counter() - started
+
+        throughput = options['logins'] / elapsed
+        self.stdout.write(
+            '%-16s %8.1f logins/s %8.1f logins/s/core %8.2f ms/login' % (
+                algorithm, throughput, throughput / cores,
+                1000 * elapsed / options['logins']))
@@ -1,6 +1,10 @@
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from user.hashing import hashing_pool
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -17,14 +21,28 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('username', 'password',)
 
     def create(self, validated_data):
-        return get_user_model().objects.create_user(**validated_data)
+        password = validated_data.pop('password')
+        user = get_user_model()(**validated_data)
+        user.username = user.normalize_username(user.username)
+        user.password = hashing_pool.run(make_password, password)
+        user.save()
+        return user
 
     def update(self, instance, validated_data):
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
-
         if password:
-            user.set_password(password)
-            user.save()
+            instance.password = hashing_pool.run(make_password, password)
 
-        return user
+        return super().update(instance, validated_data)
+
+
+class LoginSerializer(TokenObtainPairSerializer):
+
+    @classmethod
+    def get_token(cls, user):
+        # Claims read by StatelessJWTAuthentication, copied to the access
+        # token when it is derived from the refresh token.
+        token = super().get_token(user)
+        token['username'] = user.get_username()
+        token['is_active'] = user.is_active
+        return token
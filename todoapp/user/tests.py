@@ -1,14 +1,25 @@
-from django.test import TestCase
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from todoapp.querybudget import query_budget
+from user.authentication import is_user_active
+from user.hashing import HashingPool, HashingPoolSaturated
+
 
 CREATE_USER_URL = reverse('user:create')
 LOGIN_USER_URL = reverse('user:login')
+TOKEN_REFRESH_URL = reverse('user:token_refresh')
 USER_INFO_URL = reverse('user:me')
+CATEGORY_LIST_URL = reverse('todo:category-list')
 
 
 def create_user(username, password):
@@ -196,3 +207,184 @@ class PrivateUserApiTests(TestCase):
         res = self.client.patch(USER_INFO_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    """Test authenticating requests from the token claims"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(username='username', password='password')
+        self.client = APIClient()
+        res = self.client.post(
+            LOGIN_USER_URL, {'username': 'username', 'password': 'password'})
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + res.data['access'])
+
+    def test_no_user_query(self):
+        """Test that an authenticated request does not load the user row"""
+        self.client.get(CATEGORY_LIST_URL)
+
+        # the category list and the revocation check are both cached
+        with self.assertNumQueries(0):
+            res = self.client.get(CATEGORY_LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_get_user_from_token(self):
+        """Test that the profile endpoint works with a stateless user"""
+        res = self.client.get(USER_INFO_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['username'], 'username')
+
+    def test_update_user_from_token(self):
+        """Test updating the profile with a stateless user"""
+        res = self.client.patch(USER_INFO_URL, {'username': 'new_username'})
+
+        self.user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user.username, 'new_username')
+
+    def test_inactive_user_rejected(self):
+        """Test that deactivating a user revokes the token"""
+        self.client.get(CATEGORY_LIST_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(CATEGORY_LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_rejected(self):
+        """Test that deleting a user revokes the token"""
+        self.client.get(CATEGORY_LIST_URL)
+
+        self.user.delete()
+        res = self.client.get(CATEGORY_LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PasswordHashingTests(TestCase):
+    """Test the bounded password hashing pool"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_pool_rejects_when_saturated(self):
+        """Test that the pool rejects work beyond its queue depth"""
+        pool = HashingPool(workers=1, queue_depth=0)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait()
+
+        thread = threading.Thread(target=pool.run, args=(block,))
+        thread.start()
+        started.wait()
+        try:
+            with self.assertRaises(HashingPoolSaturated):
+                pool.run(make_password, 'password')
+        finally:
+            release.set()
+            thread.join()
+            pool.shutdown()
+
+    def test_create_user_saturated(self):
+        """Test that signup returns 429 while the pool is saturated"""
+        payload = {'username': 'username', 'password': '12345'}
+
+        with patch.object(HashingPool, 'run',
+                          side_effect=HashingPoolSaturated(wait=1)):
+            res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_login_saturated(self):
+        """Test that login returns 429 while the pool is saturated"""
+        payload = {'username': 'username', 'password': '12345'}
+        create_user(**payload)
+
+        with patch.object(HashingPool, 'run',
+                          side_effect=HashingPoolSaturated(wait=1)):
+            res = self.client.post(LOGIN_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.SHA1PasswordHasher',
+    ])
+    def test_login_rehashes_outdated_password(self):
+        """Test that a login upgrades a password to the preferred hasher"""
+        user = create_user('username', '12345')
+        user.password = make_password('12345', hasher='sha1')
+        user.save()
+
+        res = self.client.post(
+            LOGIN_USER_URL, {'username': 'username', 'password': '12345'})
+
+        user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password('12345'))
+
+
+class QueryBudgetApiTests(TestCase):
+    """Test the query budget of every user endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(username='username', password='password')
+        self.client = APIClient()
+
+    def login(self):
+        res = self.client.post(
+            LOGIN_USER_URL, {'username': 'username', 'password': 'password'})
+        # Budgets are for requests after the first of a token, whose user
+        # check is cached.
+        is_user_active(self.user.id)
+        return res
+
+    @query_budget(3)
+    def test_create_user(self):
+        """Test signing up"""
+        res = self.client.post(
+            CREATE_USER_URL, {'username': 'new', 'password': 'password'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_login(self):
+        """Test logging in"""
+        with query_budget(1):
+            res = self.client.post(LOGIN_USER_URL, {
+                'username': 'username', 'password': 'password'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_refresh(self):
+        """Test refreshing an access token from the claims alone"""
+        refresh = self.login().data['refresh']
+
+        with query_budget(0):
+            res = self.client.post(TOKEN_REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_and_update_user(self):
+        """Test retrieving and updating the profile"""
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.login().data['access'])
+
+        with query_budget(1):
+            res = self.client.get(USER_INFO_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with query_budget(3):
+            res = self.client.patch(USER_INFO_URL, {'username': 'new'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -1,11 +1,28 @@
+from django.contrib.auth import get_user_model
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.views import TokenObtainPairView, \
+    TokenRefreshView
 
-from user.serializers import UserSerializer
+from todoapp.throttling import IPTokenBucketThrottle
+from user.serializers import UserSerializer, LoginSerializer
 
 
 class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
+    throttle_classes = (IPTokenBucketThrottle,)
+    throttle_scope = 'auth'
+
+
+class LoginView(TokenObtainPairView):
+    serializer_class = LoginSerializer
+    throttle_classes = (IPTokenBucketThrottle,)
+    throttle_scope = 'auth'
+
+
+class RefreshView(TokenRefreshView):
+    throttle_classes = (IPTokenBucketThrottle,)
+    throttle_scope = 'auth'
 
 
 class ManagerUserView(generics.RetrieveUpdateAPIView):
@@ -13,4 +30,7 @@ class ManagerUserView(generics.RetrieveUpdateAPIView):
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):
-        return self.request.user
+        # Stateless token users carry no row to update.
+        if isinstance(self.request.user, get_user_model()):
+            return self.request.user
+        return get_user_model().objects.get(pk=self.request.user.pk)